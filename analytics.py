@@ -0,0 +1,247 @@
+"""Per-language usage rollups.
+
+Counters are kept in ``usage_rollup`` per hour and per day, bot language,
+metric and currency, so reports never touch the raw tables:
+
+* ``messages`` and ``new_users`` are recorded on the write path and flushed
+  in batches;
+* ``payments``, ``conversions`` (first payment of a user) and ``revenue``
+  are caught up from ``payments`` by id, remembering the last id seen.
+
+Reports open the database read-only. ``python analytics.py [days] [hour|day]``
+prints the rollup as CSV.
+"""
+import asyncio
+import csv
+import io
+import logging
+import os
+import pathlib
+import sys
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import aiosqlite
+from aiogram.filters import CommandObject
+from aiogram.types import BufferedInputFile, Message
+
+from database import DB_PATH
+
+FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "60"))
+CATCH_UP_BATCH = 500
+ADMIN_IDS = frozenset(
+    int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()
+)
+CSV_HEADER = ["bucket", "bot_lang", "metric", "currency", "value"]
+
+logger = logging.getLogger(__name__)
+
+# (hour bucket, bot language, metric, currency) -> increment
+_CounterKey = Tuple[str, str, str, str]
+
+
+def _hour_bucket(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H", time.gmtime(timestamp))
+
+
+async def _apply(db: aiosqlite.Connection, counters: Dict[_CounterKey, int]) -> None:
+    rows = []
+    for (hour, bot_lang, metric, currency), value in counters.items():
+        rows.append(("hour", hour, bot_lang, metric, currency, value))
+        rows.append(("day", hour[:10], bot_lang, metric, currency, value))
+    await db.executemany(
+        "INSERT INTO usage_rollup (period, bucket, bot_lang, metric, currency, value) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(period, bucket, bot_lang, metric, currency) "
+        "DO UPDATE SET value = value + excluded.value",
+        rows,
+    )
+
+
+class UsageRollup:
+    """Accumulates usage counters in memory and folds them into the rollup."""
+
+    def __init__(self, interval: float = FLUSH_INTERVAL) -> None:
+        self.interval = interval
+        self._counters: Dict[_CounterKey, int] = {}
+        self._first_seen: Dict[int, str] = {}
+        self._task = None
+        self._closing = False
+        self._wake = asyncio.Event()
+
+    def record(self, metric: str, bot_lang: str, value: int = 1, currency: str = "") -> None:
+        key = (_hour_bucket(time.time()), bot_lang, metric, currency)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def record_message(self, bot_lang: str, user_id: int) -> None:
+        """Count an answered message; the user's first one also counts as a new user."""
+        self.record("messages", bot_lang)
+        self._first_seen.setdefault(user_id, bot_lang)
+
+    async def flush(self) -> None:
+        if not self._counters and not self._first_seen:
+            return
+        counters, self._counters = self._counters, {}
+        first_seen, self._first_seen = self._first_seen, {}
+        try:
+            async with aiosqlite.connect(DB_PATH) as db:
+                by_lang: Dict[str, List[Tuple[int, str]]] = {}
+                for user_id, bot_lang in first_seen.items():
+                    by_lang.setdefault(bot_lang, []).append((user_id, bot_lang))
+                hour = _hour_bucket(time.time())
+                for bot_lang, rows in by_lang.items():
+                    before = db.total_changes
+                    await db.executemany(
+                        "INSERT OR IGNORE INTO user_first_seen (user_id, bot_lang) VALUES (?, ?)",
+                        rows,
+                    )
+                    new_users = db.total_changes - before
+                    if new_users:
+                        key = (hour, bot_lang, "new_users", "")
+                        counters[key] = counters.get(key, 0) + new_users
+                await _apply(db, counters)
+                await db.commit()
+        except Exception:
+            logger.exception("Failed to flush usage counters, will retry")
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for user_id, bot_lang in first_seen.items():
+                self._first_seen.setdefault(user_id, bot_lang)
+
+    async def catch_up_payments(self) -> int:
+        """Fold payments added since the last run into the rollup."""
+        total = 0
+        async with aiosqlite.connect(DB_PATH) as db:
+            while True:
+                cur = await db.execute("SELECT last_id FROM analytics_cursors WHERE name = 'payments'")
+                row = await cur.fetchone()
+                last_id = row[0] if row else 0
+                cur = await db.execute(
+                    "SELECT p.id, p.amount, p.currency, COALESCE(p.bot_lang, 'unknown'), p.timestamp, "
+                    "NOT EXISTS (SELECT 1 FROM payments e WHERE e.user_id = p.user_id AND e.id < p.id) "
+                    "FROM payments p WHERE p.id > ? ORDER BY p.id LIMIT ?",
+                    (last_id, CATCH_UP_BATCH),
+                )
+                rows = await cur.fetchall()
+                if not rows:
+                    return total
+                counters: Dict[_CounterKey, int] = {}
+                for _, amount, currency, bot_lang, timestamp, first in rows:
+                    hour = str(timestamp)[:13]
+                    for metric, currency_key, value in (
+                        ("payments", "", 1),
+                        ("revenue", currency or "", amount or 0),
+                        ("conversions", "", 1 if first else 0),
+                    ):
+                        if value:
+                            key = (hour, bot_lang, metric, currency_key)
+                            counters[key] = counters.get(key, 0) + value
+                await _apply(db, counters)
+                await db.execute(
+                    "INSERT INTO analytics_cursors (name, last_id) VALUES ('payments', ?) "
+                    "ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id",
+                    (rows[-1][0],),
+                )
+                await db.commit()
+                total += len(rows)
+                if len(rows) < CATCH_UP_BATCH:
+                    return total
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            try:
+                await self.catch_up_payments()
+            except Exception:
+                logger.exception("Payments catch-up failed")
+
+    async def close(self) -> None:
+        """Stop the background job and write what is left."""
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+usage = UsageRollup()
+
+
+async def read_rollup(days: int, period: str = "day") -> List[Tuple]:
+    """Return rollup rows of the last ``days`` days from a read-only connection."""
+    since = time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))
+    uri = pathlib.Path(DB_PATH).resolve().as_uri() + "?mode=ro"
+    async with aiosqlite.connect(uri, uri=True) as db:
+        cur = await db.execute(
+            "SELECT bucket, bot_lang, metric, currency, value FROM usage_rollup "
+            "WHERE period = ? AND bucket >= ? ORDER BY bucket, bot_lang, metric, currency",
+            (period, since),
+        )
+        return list(await cur.fetchall())
+
+
+def to_csv(rows: Iterable[Tuple]) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_HEADER)
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+def format_summary(rows: Iterable[Tuple]) -> str:
+    """Render day rows as one line per day and bot language."""
+    lines: Dict[Tuple[str, str], Dict[str, object]] = {}
+    for bucket, bot_lang, metric, currency, value in rows:
+        line = lines.setdefault((bucket, bot_lang), {"revenue": []})
+        if metric == "revenue":
+            line["revenue"].append(f"{value} {currency}")
+        else:
+            line[metric] = value
+    return "\n".join(
+        f"{bucket} {bot_lang}: msgs {line.get('messages', 0)}, new {line.get('new_users', 0)}, "
+        f"paid {line.get('payments', 0)}, conv {line.get('conversions', 0)}, "
+        f"revenue {', '.join(line['revenue']) or 0}"
+        for (bucket, bot_lang), line in lines.items()
+    )
+
+
+def _days_arg(command: CommandObject, default: int) -> int:
+    try:
+        return max(1, int((command.args or "").split()[0]))
+    except (IndexError, ValueError):
+        return default
+
+
+async def stats_command(message: Message, command: CommandObject) -> None:
+    """/stats [days] - per-language daily totals for admins."""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    rows = await read_rollup(_days_arg(command, 7))
+    # Telegram rejects messages longer than 4096 characters
+    await message.answer(format_summary(rows)[:4000] or "Нет данных")
+
+
+async def export_command(message: Message, command: CommandObject) -> None:
+    """/export [days] [hour|day] - rollup as a CSV document for admins."""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    args = (command.args or "").split()
+    period = "hour" if "hour" in args else "day"
+    rows = await read_rollup(_days_arg(command, 30), period)
+    document = BufferedInputFile(to_csv(rows).encode("utf-8"), filename=f"usage_{period}.csv")
+    await message.answer_document(document)
+
+
+if __name__ == "__main__":
+    cli_days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    cli_period = sys.argv[2] if len(sys.argv) > 2 else "day"
+    sys.stdout.write(to_csv(asyncio.run(read_rollup(cli_days, cli_period))))
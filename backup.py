@@ -0,0 +1,274 @@
+"""Online snapshots of users.db.
+
+Snapshots are taken with SQLite's online backup API from a worker thread.
+A WAL database is copied in one step, since readers do not block writers
+there; otherwise ``BACKUP_PAGES`` pages are copied per step with a short
+pause in between so the bots can keep writing. Each snapshot is
+gzip-compressed, gets a ``.sha256`` file next to it in ``sha256sum`` format
+and only the newest ``BACKUP_KEEP`` are kept::
+
+    python backup.py create
+    python backup.py verify backups/users-20250101-000000.db.gz
+    python backup.py restore backups/users-20250101-000000.db.gz --force
+
+Stop the bots before restoring.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import IO, Dict, List, Optional, Tuple
+
+from database import DB_PATH
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+# Seconds between scheduled snapshots, 0 disables them
+BACKUP_INTERVAL = float(os.getenv("BACKUP_INTERVAL", "21600"))
+BACKUP_PAGES = int(os.getenv("BACKUP_PAGES", "256"))
+# Pause after every step so writers can take the lock
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.005"))
+SNAPSHOT_PREFIX = "users-"
+SNAPSHOT_SUFFIX = ".db.gz"
+CHUNK = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _integrity_ok(path: str) -> bool:
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    finally:
+        db.close()
+
+
+def list_snapshots(dest_dir: str = BACKUP_DIR) -> List[str]:
+    """Return snapshot paths, oldest first."""
+    if not os.path.isdir(dest_dir):
+        return []
+    names = sorted(
+        name
+        for name in os.listdir(dest_dir)
+        if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)
+    )
+    return [os.path.join(dest_dir, name) for name in names]
+
+
+def rotate(dest_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> None:
+    """Delete all but the newest ``keep`` snapshots.
+
+    Snapshots without a ``.sha256`` file are incomplete and are not counted.
+    """
+    snapshots = [path for path in list_snapshots(dest_dir) if os.path.exists(path + ".sha256")]
+    for path in snapshots[: max(len(snapshots) - keep, 0)]:
+        for stale in (path, path + ".sha256"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        logger.info("Removed old snapshot %s", path)
+
+
+def _temp_file(dest_dir: str, suffix: str) -> str:
+    fd, path = tempfile.mkstemp(prefix=SNAPSHOT_PREFIX, suffix=suffix, dir=dest_dir)
+    os.close(fd)
+    return path
+
+
+def _claim_name(dest_dir: str) -> Tuple[str, IO[str]]:
+    """Reserve a snapshot name by creating its checksum file exclusively."""
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    for n in itertools.count(1):
+        suffix = "" if n == 1 else f"-{n}"
+        path = os.path.join(dest_dir, f"{SNAPSHOT_PREFIX}{stamp}{suffix}{SNAPSHOT_SUFFIX}")
+        try:
+            return path, open(path + ".sha256", "x", encoding="utf-8")
+        except FileExistsError:
+            continue
+
+
+def snapshot(
+    source: str = DB_PATH,
+    dest_dir: str = BACKUP_DIR,
+    pages: int = BACKUP_PAGES,
+    step_sleep: float = BACKUP_STEP_SLEEP,
+    keep: int = BACKUP_KEEP,
+) -> Dict:
+    """Copy ``source`` into a compressed, checksummed snapshot. Blocking."""
+    os.makedirs(dest_dir, exist_ok=True)
+    # Unique temporary files, a CLI run may overlap the scheduled job
+    raw = _temp_file(dest_dir, ".tmp")
+    part = _temp_file(dest_dir, ".part")
+    steps = 0
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal steps
+        steps += 1
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+
+    try:
+        started = time.perf_counter()
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(raw)
+        try:
+            # A write from another connection between steps restarts the copy, so
+            # under steady traffic a stepped backup never finishes. In WAL mode the
+            # copy is only a reader and does not block writers, so take it in one step.
+            if src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+                pages = -1
+            src.backup(dst, pages=pages, progress=progress)
+        finally:
+            dst.close()
+            src.close()
+        copied = time.perf_counter()
+        if not _integrity_ok(raw):
+            raise RuntimeError(f"Snapshot of {source} failed the integrity check")
+        size = os.path.getsize(raw)
+        with open(raw, "rb") as f_in, gzip.open(part, "wb", compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out, CHUNK)
+        # The checksum is in place before the snapshot appears under its name
+        checksum = _sha256(part)
+        path, sidecar = _claim_name(dest_dir)
+        with sidecar:
+            sidecar.write(f"{checksum}  {os.path.basename(path)}\n")
+        os.replace(part, path)
+    finally:
+        for leftover in (raw, part):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    rotate(dest_dir, keep)
+    finished = time.perf_counter()
+    result = {
+        "path": path,
+        "db_bytes": size,
+        "gz_bytes": os.path.getsize(path),
+        "steps": steps,
+        "copy_s": copied - started,
+        "total_s": finished - started,
+    }
+    logger.info(
+        "Snapshot %s: %d KiB -> %d KiB in %d steps, copy %.2fs, total %.2fs",
+        path, size // 1024, result["gz_bytes"] // 1024, steps, result["copy_s"], result["total_s"],
+    )
+    return result
+
+
+async def create_backup(**kwargs) -> Dict:
+    """Run ``snapshot`` in a worker thread so the event loop keeps serving."""
+    return await asyncio.to_thread(snapshot, **kwargs)
+
+
+def _decompress(path: str, target: str) -> None:
+    with gzip.open(path, "rb") as f_in, open(target, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out, CHUNK)
+
+
+def verify(path: str) -> None:
+    """Raise ``ValueError`` unless the checksum and the database inside are intact."""
+    checksum_path = path + ".sha256"
+    if not os.path.exists(checksum_path):
+        raise ValueError(f"{checksum_path} is missing")
+    with open(checksum_path, "r", encoding="utf-8") as f:
+        expected = f.read().split()[0]
+    if _sha256(path) != expected:
+        raise ValueError(f"Checksum mismatch for {path}")
+    raw = _temp_file(os.path.dirname(path) or ".", ".verify")
+    try:
+        _decompress(path, raw)
+        if not _integrity_ok(raw):
+            raise ValueError(f"{path} contains a damaged database")
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+
+
+def restore(path: str, target: str = DB_PATH, force: bool = False) -> None:
+    """Verify the snapshot and atomically put it in place of ``target``."""
+    # An empty file holds no data, that one is safe to replace
+    if os.path.exists(target) and os.path.getsize(target) and not force:
+        raise FileExistsError(f"{target} exists, pass force=True to overwrite it")
+    verify(path)
+    staged = target + ".restore"
+    _decompress(path, staged)
+    # A WAL left from the old database would be replayed onto the snapshot
+    for leftover in (target + "-wal", target + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    os.replace(staged, target)
+    logger.info("Restored %s from %s", target, path)
+
+
+class BackupJob:
+    """Takes a snapshot every ``interval`` seconds in the background."""
+
+    def __init__(self, interval: float = BACKUP_INTERVAL) -> None:
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await create_backup()
+            except Exception:
+                logger.exception("Scheduled backup failed")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # The worker thread finishes a running snapshot on its own
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="users.db snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create")
+    sub.add_parser("list")
+    verify_cmd = sub.add_parser("verify")
+    verify_cmd.add_argument("snapshot")
+    restore_cmd = sub.add_parser("restore")
+    restore_cmd.add_argument("snapshot")
+    restore_cmd.add_argument("--target", default=DB_PATH)
+    restore_cmd.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    try:
+        if args.command == "create":
+            print(snapshot()["path"])
+        elif args.command == "list":
+            print("\n".join(list_snapshots()))
+        elif args.command == "verify":
+            verify(args.snapshot)
+            print("OK")
+        else:
+            restore(args.snapshot, args.target, args.force)
+            print(f"Restored {args.target}")
+    except (ValueError, FileExistsError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Backup throughput and its effect on handler latency.
+
+Builds a scratch database, then measures the latency of small write
+transactions issued from the event loop (like the bot handlers do) first
+alone and then while a snapshot is taken::
+
+    python bench_backup.py
+    python bench_backup.py --rows 500000 --pages 1024
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import List
+
+from backup import BACKUP_PAGES, BACKUP_STEP_SLEEP, create_backup
+
+
+def build_database(path: str, rows: int) -> None:
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE messages (id INTEGER PRIMARY KEY, user_id INTEGER, message TEXT, "
+        "timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)"
+    )
+    db.executemany(
+        "INSERT INTO messages (user_id, message) VALUES (?, ?)",
+        ((i % 5000, f"message {i} " + "x" * 120) for i in range(rows)),
+    )
+    db.commit()
+    db.close()
+
+
+async def handler_load(path: str, stop: asyncio.Event, interval: float) -> List[float]:
+    """Insert one row per ``interval`` and return the latency of each in ms."""
+    db = sqlite3.connect(path, timeout=5)
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        db.execute("INSERT INTO messages (user_id, message) VALUES (?, ?)", (1, "ping"))
+        db.commit()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    db.close()
+    return latencies
+
+
+def describe(name: str, latencies: List[float]) -> None:
+    ordered = sorted(latencies)
+
+    def pct(p: float) -> float:
+        return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+    print(
+        f"{name:>14}: n={len(ordered)} p50={statistics.median(ordered):.2f}ms "
+        f"p95={pct(0.95):.2f}ms p99={pct(0.99):.2f}ms max={ordered[-1]:.2f}ms"
+    )
+
+
+async def run(rows: int, pages: int, step_sleep: float, baseline: float, interval: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "bench.db")
+        build_database(source, rows)
+        print(f"database: {os.path.getsize(source) / 1e6:.1f} MB, {rows} rows")
+
+        stop = asyncio.Event()
+        load = asyncio.create_task(handler_load(source, stop, interval))
+        await asyncio.sleep(baseline)
+        stop.set()
+        describe("no backup", await load)
+
+        stop = asyncio.Event()
+        load = asyncio.create_task(handler_load(source, stop, interval))
+        result = await create_backup(
+            source=source, dest_dir=os.path.join(tmp, "snapshots"),
+            pages=pages, step_sleep=step_sleep, keep=1,
+        )
+        stop.set()
+        describe("during backup", await load)
+        print(
+            f"backup: {result['steps']} steps, copy {result['copy_s']:.2f}s "
+            f"({result['db_bytes'] / 1e6 / result['copy_s']:.1f} MB/s), "
+            f"total with gzip+sha256 {result['total_s']:.2f}s, "
+            f"{result['gz_bytes'] / 1e6:.1f} MB compressed"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--pages", type=int, default=BACKUP_PAGES)
+    parser.add_argument("--step-sleep", type=float, default=BACKUP_STEP_SLEEP)
+    parser.add_argument("--baseline", type=float, default=2.0, help="seconds without backup")
+    parser.add_argument("--interval", type=float, default=0.002, help="seconds between writes")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.pages, args.step_sleep, args.baseline, args.interval))
+
+
+if __name__ == "__main__":
+    main()
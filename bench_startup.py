@@ -0,0 +1,60 @@
+"""Cold start benchmark for the bot entry points.
+
+Imports each module in a fresh interpreter with ``-X importtime`` and prints
+the wall time, the cumulative import time and the slowest imports::
+
+    python bench_startup.py
+    python bench_startup.py --runs 5 --top 15 bot
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+TARGETS = ["bot", "support_bot"]
+
+
+def measure(module: str) -> Tuple[float, Dict[str, int]]:
+    """Return wall time in seconds and cumulative import time per module in us."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+    cumulative: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumul, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumul)
+    return wall, cumulative
+
+
+def report(module: str, runs: int, top: int) -> None:
+    results: List[Tuple[float, Dict[str, int]]] = [measure(module) for _ in range(runs)]
+    wall, cumulative = min(results, key=lambda r: r[0])
+    print(f"{module}: wall {wall * 1000:.1f} ms, imports {cumulative.get(module, 0) / 1000:.1f} ms (best of {runs})")
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)
+    for name, us in [item for item in slowest if item[0] != module][:top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=TARGETS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    for module in args.modules:
+        report(module, args.runs, args.top)
+
+
+if __name__ == "__main__":
+    main()
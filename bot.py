@@ -1,115 +1,35 @@
 import asyncio
 import logging
 import os
-import sqlite3
 
-from aiogram import Bot, Dispatcher
+from aiogram import Bot, Dispatcher, F
 from aiogram.filters import CommandStart, Command
-from aiogram.types import (
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
-    Message,
-    ReplyKeyboardMarkup,
-    KeyboardButton,
-    LabeledPrice,
-)
-from handlers import *
-from payments import *
-from openai import AsyncOpenAI
+from aiogram.types import Message, LabeledPrice
+from analytics import export_command, stats_command, usage
+from backup import BackupJob
+from database import close_db, init_db, is_premium_user
+from fleet import FleetManager, fleet_command
+from i18n import keyboard, reload_on_sighup, text
+from lifecycle import Lifecycle
+from openai_client import close as close_openai, warm_up
+from payments import setup_payment_handlers
+from quota import QuotaLedger
+from routing import complete
 
 # Configuration from environment variables
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 FREE_MESSAGES = int(os.getenv("FREE_MESSAGES", "10"))
+# Seconds a user waits for an answer before getting the error message
+REPLY_DEADLINE = float(os.getenv("REPLY_DEADLINE", "30"))
 
-BOTS = [
-    {"token": os.getenv("TOKEN_TURKEY"), "lang": "tr"},
-    {"token": os.getenv("TOKEN_INDONESIA"), "lang": "id"},
-    {"token": os.getenv("TOKEN_ARABIC"), "lang": "ar"},
-    {"token": os.getenv("TOKEN_VIETNAM"), "lang": "vi"},
-    {"token": os.getenv("TOKEN_BRAZIL"), "lang": "pt"},
-]
 
-WELCOME_MESSAGES = {
-    "tr": "🇹🇷 Merhaba! Ben senin Türkçe AI asistanınım. İlk 10 mesaj — ücretsiz.",
-    "id": "🇮🇩 Hai! Saya asisten AI pertamamu dalam Bahasa Indonesia. 10 pesan pertama — gratis.",
-    "ar": "🇦🇪 أهلاً! أنا مساعد الذكاء الاصطناعي الأول باللغة العربية. أول 10 رسائل مجاناً.",
-    "vi": "🇻🇳 Xin chào! Tôi là trợ lý AI đầu tiên bằng tiếng Việt. 10 tin nhắn đầu tiên miễn phí.",
-    "pt": "🇧🇷 Olá! Sou seu primeiro assistente de IA em português. Primeiras 10 mensagens grátis.",
-}
-
-# Texts shown when a user reaches the free message limit
-LIMIT_REACHED_MESSAGES = {
-    "tr": "Ücretsiz mesaj sınırına ulaşıldı.",
-    "id": "Batas pesan gratis telah tercapai.",
-    "ar": "تم استهلاك الحد الأقصى للرسائل المجانية.",
-    "vi": "Bạn đã sử dụng hết số tin nhắn miễn phí.",
-    "pt": "Limite de mensagens gratuitas atingido.",
-}
-
-# Database setup
-DB_PATH = "users.db"
-conn = sqlite3.connect(DB_PATH)
-conn.execute(
-    "CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, message_count INTEGER DEFAULT 0)"
-)
-conn.commit()
-
-openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-
-
-def get_message_count(user_id: int) -> int:
-    cur = conn.execute("SELECT message_count FROM users WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
-    return row[0] if row else 0
-
-
-def increment_message_count(user_id: int) -> None:
-    cur = conn.execute("SELECT message_count FROM users WHERE user_id = ?", (user_id,))
-    if cur.fetchone():
-        conn.execute(
-            "UPDATE users SET message_count = message_count + 1 WHERE user_id = ?",
-            (user_id,),
-        )
-    else:
-        conn.execute(
-            "INSERT INTO users (user_id, message_count) VALUES (?, 1)",
-            (user_id,),
-        )
-    conn.commit()
-
-
-def purchase_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="Купить подписку 🔓",
-                    url="https://t.me/your_bot?start=pay",
-                )
-            ]
-        ]
-    )
-
-
-def reply_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text="Напиши сообщение")]],
-        resize_keyboard=True,
-    )
-
-
-async def start_bot(token: str, lang: str) -> None:
-    if not token:
-        logging.warning("Token for language %s is not set", lang)
-        return
-
-    bot = Bot(token=token)
+def build_dispatcher(bot: Bot, lang: str, quota: QuotaLedger) -> Dispatcher:
+    """Create the dispatcher with all handlers of one language bot."""
     dp = Dispatcher()
-    dp.include_router(setup_payment_handlers())
+    dp.include_router(setup_payment_handlers(lang))
 
     @dp.message(CommandStart())
     async def start_handler(message: Message) -> None:
-        await message.answer(WELCOME_MESSAGES.get(lang, "Привет!"), reply_markup=reply_keyboard())
+        await message.answer(text(lang, "welcome"), reply_markup=keyboard(lang, "reply"))
 
     @dp.message(Command('buy'))
     async def buy_handler(message: Message) -> None:
@@ -125,41 +45,75 @@ async def start_bot(token: str, lang: str) -> None:
             start_parameter='buy-premium'
         )
 
-    @dp.message()
+    dp.message.register(stats_command, Command("stats"))
+    dp.message.register(export_command, Command("export"))
+    dp.message.register(fleet_command, Command("fleet"))
+
+    # Text only, so successful_payment messages reach the payments router
+    @dp.message(F.text)
     async def handle_message(message: Message) -> None:
         if message.text.startswith("/start"):
             return
         user_id = message.from_user.id
-        count = get_message_count(user_id)
-        if count >= FREE_MESSAGES:
+        reservation = await quota.reserve(user_id)
+        if reservation is None:
             await message.answer(
-                LIMIT_REACHED_MESSAGES.get(lang, "Лимит бесплатных сообщений исчерпан."),
-                reply_markup=purchase_keyboard(),
+                text(lang, "limit_reached"),
+                reply_markup=keyboard(lang, "purchase"),
             )
             return
 
-        increment_message_count(user_id)
-
+        deadline = asyncio.get_running_loop().time() + REPLY_DEADLINE
         try:
-            completion = await openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            answer = await complete(
+                [
                     {"role": "system", "content": f"You are a helpful assistant. Always respond in {lang}."},
                     {"role": "user", "content": message.text},
                 ],
+                lang,
+                premium=await is_premium_user(user_id),
+                deadline=deadline,
             )
-            answer = completion.choices[0].message.content.strip()
+            if not answer:
+                raise ValueError("Empty completion")
             await message.answer(answer)
+            reservation.commit()
+            usage.record_message(lang, user_id)
         except Exception:
             logging.exception("OpenAI error")
-            await message.answer("Ошибка подключения. Попробуйте позже.")
+            await message.answer(text(lang, "connection_error"))
+        finally:
+            # Failed, timed out or cancelled on shutdown: the message is not charged
+            reservation.release()
+
+    return dp
 
-    await dp.start_polling(bot)
 
 async def main() -> None:
     logging.basicConfig(level=logging.INFO)
-    tasks = [start_bot(cfg["token"], cfg["lang"]) for cfg in BOTS if cfg["token"]]
-    await asyncio.gather(*tasks)
+    reload_on_sighup()
+    # The OpenAI SDK is the slowest import; load it while the schema is checked
+    await asyncio.gather(asyncio.to_thread(init_db), warm_up())
+    lifecycle = Lifecycle()
+    lifecycle.install_signal_handlers()
+    lifecycle.on_shutdown(close_db)
+    lifecycle.on_shutdown(close_openai)
+    quota = QuotaLedger(FREE_MESSAGES)
+    quota.start()
+    lifecycle.on_shutdown(quota.close)
+    usage.start()
+    lifecycle.on_shutdown(usage.close)
+    backup_job = BackupJob()
+    backup_job.start()
+    lifecycle.on_shutdown(backup_job.close)
+    fleet = FleetManager(lambda bot, lang: build_dispatcher(bot, lang, quota))
+    lifecycle.on_shutdown(fleet.close)
+    try:
+        await fleet.start()
+        await lifecycle.wait()
+    finally:
+        await lifecycle.shutdown()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
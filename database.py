@@ -1,5 +1,6 @@
 import os
 import sqlite3
+import threading
 from typing import Optional, Dict, List, Tuple
 
 
@@ -11,12 +12,39 @@ load_dotenv()
 
 DB_PATH = os.getenv("DB_PATH", "users.db")
 
-# Connection is created with check_same_thread=False to allow usage inside aiogram handlers
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+_conn: Optional[sqlite3.Connection] = None
+_conn_lock = threading.Lock()
+
+_initialized = False
+
+
+def get_conn() -> sqlite3.Connection:
+    """Return the shared connection, opening it on first use.
+
+    Nothing is opened on import, so importing a module does not create
+    ``DB_PATH`` in the working directory.
+    """
+    global _conn
+    if _conn is None:
+        with _conn_lock:
+            if _conn is None:
+                # check_same_thread=False allows usage inside aiogram handlers
+                _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    return _conn
 
 
 def init_db() -> None:
-    """Create or update users table."""
+    """Create or update all tables. Runs the schema work once per process."""
+    global _initialized
+    if _initialized:
+        return
+    conn = get_conn()
+    # WAL lets report queries read while the bots keep writing. The mode
+    # cannot change inside a transaction, so switch before the schema work
+    conn.commit()
+    mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    if mode.lower() != "wal":
+        raise RuntimeError(f"Could not switch {DB_PATH} to WAL, journal mode is {mode}")
     cur = conn.execute(
         "SELECT name FROM sqlite_master WHERE type='table' AND name='users'"
     )
@@ -33,9 +61,13 @@ def init_db() -> None:
         )
     else:
         cur = conn.execute("PRAGMA table_info(users)")
-        cols = {row[1] for row in cur.fetchall()}
+        info = cur.fetchall()
+        cols = {row[1] for row in info}
         if "user_id" not in cols:
             conn.execute("ALTER TABLE users ADD COLUMN user_id INTEGER")
+        if not any(row[1] == "user_id" and row[5] for row in info):
+            # Legacy tables are keyed by telegram_id; quota lookups go by user_id
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_user_id ON users (user_id)")
         if "message_count" not in cols:
             conn.execute(
                 "ALTER TABLE users ADD COLUMN message_count INTEGER DEFAULT 0"
@@ -67,6 +99,33 @@ def init_db() -> None:
         )
         """
     )
+    cur = conn.execute("PRAGMA table_info(support_messages)")
+    if "ticket_id" not in {row[1] for row in cur.fetchall()}:
+        conn.execute("ALTER TABLE support_messages ADD COLUMN ticket_id INTEGER")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            username TEXT,
+            language_code TEXT,
+            kind TEXT,
+            status TEXT DEFAULT 'open',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tickets_user ON tickets (user_id, status)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status, id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_support_messages_user "
+        "ON support_messages (user_id, timestamp)"
+    )
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS payments (
@@ -80,13 +139,67 @@ def init_db() -> None:
         )
         """
     )
+    # Language of the bot a row came from, used by analytics rollups
+    for table in ("messages", "payments"):
+        cur = conn.execute(f"PRAGMA table_info({table})")
+        if "bot_lang" not in {row[1] for row in cur.fetchall()}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN bot_lang TEXT")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_payments_user ON payments (user_id, id)"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usage_rollup (
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            bot_lang TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            currency TEXT NOT NULL DEFAULT '',
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, bucket, bot_lang, metric, currency)
+        ) WITHOUT ROWID
+        """
+    )
+    cur = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='user_first_seen'"
+    )
+    seed_first_seen = cur.fetchone() is None
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_first_seen (
+            user_id INTEGER PRIMARY KEY,
+            bot_lang TEXT,
+            first_seen DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    if seed_first_seen:
+        # Users from before analytics existed must not show up as new
+        conn.execute(
+            "INSERT OR IGNORE INTO user_first_seen (user_id, bot_lang) "
+            "SELECT user_id, 'unknown' FROM users WHERE user_id IS NOT NULL"
+        )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS analytics_cursors (name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)"
+    )
     conn.commit()
+    _initialized = True
     from utils import log_info
     log_info("Database initialized")
 
 
+def close_db() -> None:
+    """Commit pending changes and close the shared connection."""
+    global _conn
+    if _conn is not None:
+        _conn.commit()
+        _conn.close()
+        _conn = None
+
+
 def get_user(telegram_id: int) -> Optional[Dict]:
     """Return user dictionary or None."""
+    conn = get_conn()
     cur = conn.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
     row = cur.fetchone()
     if row:
@@ -97,6 +210,7 @@ def get_user(telegram_id: int) -> Optional[Dict]:
 
 def increment_messages(telegram_id: int) -> None:
     """Increase message count for user; create user row if needed."""
+    conn = get_conn()
     user = get_user(telegram_id)
     if user:
         conn.execute(
@@ -113,6 +227,7 @@ def increment_messages(telegram_id: int) -> None:
 
 def reset_messages(telegram_id: int) -> None:
     """Reset message counter for the given user."""
+    conn = get_conn()
     conn.execute(
         "UPDATE users SET message_count = 0 WHERE telegram_id = ?",
         (telegram_id,),
@@ -122,6 +237,7 @@ def reset_messages(telegram_id: int) -> None:
 
 def set_paid(telegram_id: int, paid: bool = True) -> None:
     """Mark user as paid or unpaid."""
+    conn = get_conn()
     conn.execute(
         "UPDATE users SET is_paid = ? WHERE telegram_id = ?",
         (1 if paid else 0, telegram_id),
@@ -129,12 +245,14 @@ def set_paid(telegram_id: int, paid: bool = True) -> None:
     conn.commit()
 
 
-async def add_message(user_id: int, message: str, is_user: bool) -> None:
+async def add_message(
+    user_id: int, message: str, is_user: bool, bot_lang: Optional[str] = None
+) -> None:
     """Store a single message for given user."""
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
-            "INSERT INTO messages (user_id, message, is_user) VALUES (?, ?, ?)",
-            (user_id, message, 1 if is_user else 0),
+            "INSERT INTO messages (user_id, message, is_user, bot_lang) VALUES (?, ?, ?, ?)",
+            (user_id, message, 1 if is_user else 0, bot_lang),
         )
         await db.commit()
 
@@ -178,6 +296,60 @@ async def increment_message_count(user_id: int) -> None:
         await db.commit()
 
 
+async def get_used_messages(user_id: int) -> int:
+    """Return how many messages were charged to the user."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute(
+            "SELECT message_count FROM users WHERE user_id = ?",
+            (user_id,),
+        )
+        row = await cur.fetchone()
+    return (row[0] or 0) if row else 0
+
+
+async def add_used_messages(deltas: Dict[int, int]) -> None:
+    """Add charged messages for several users in one transaction."""
+    # No ON CONFLICT upsert: legacy users tables have no unique user_id
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.executemany(
+            "UPDATE users SET message_count = COALESCE(message_count, 0) + ? WHERE user_id = ?",
+            [(delta, user_id) for user_id, delta in deltas.items()],
+        )
+        await db.executemany(
+            "INSERT INTO users (user_id, message_count) SELECT ?, ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM users WHERE user_id = ?)",
+            [(user_id, delta, user_id) for user_id, delta in deltas.items()],
+        )
+        await db.commit()
+
+
+# Premium flag per user, read once and kept current by mark_user_premium
+PREMIUM_CACHE_SIZE = int(os.getenv("PREMIUM_CACHE_SIZE", "50000"))
+_premium_cache: Dict[int, bool] = {}
+
+
+def _remember_premium(user_id: int, premium: bool) -> None:
+    _premium_cache.pop(user_id, None)
+    _premium_cache[user_id] = premium
+    if len(_premium_cache) > PREMIUM_CACHE_SIZE:
+        del _premium_cache[next(iter(_premium_cache))]
+
+
+async def is_premium_user(user_id: int) -> bool:
+    premium = _premium_cache.get(user_id)
+    if premium is not None:
+        return premium
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute(
+            "SELECT is_premium FROM users WHERE user_id = ?",
+            (user_id,),
+        )
+        row = await cur.fetchone()
+    premium = bool(row and row[0])
+    _remember_premium(user_id, premium)
+    return premium
+
+
 async def mark_user_premium(user_id: int):
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute(
@@ -185,28 +357,124 @@ async def mark_user_premium(user_id: int):
             (user_id,),
         )
         await db.commit()
+    _remember_premium(user_id, True)
+
+
+# Last known language per user, filled on every support write
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "10000"))
+_language_cache: Dict[int, str] = {}
+
+TICKET_STATUSES = ("open", "answered", "closed")
+
 
+def _remember_language(user_id: int, language_code: str) -> None:
+    _language_cache.pop(user_id, None)
+    _language_cache[user_id] = language_code
+    if len(_language_cache) > LANGUAGE_CACHE_SIZE:
+        del _language_cache[next(iter(_language_cache))]
 
-def log_support_message(user_id: int, username: str, language_code: str, message: str) -> None:
+
+def log_support_message(
+    user_id: int,
+    username: str,
+    language_code: str,
+    message: str,
+    ticket_id: Optional[int] = None,
+) -> None:
     """Store user support message for later reference."""
+    conn = get_conn()
     conn.execute(
-        "INSERT INTO support_messages (user_id, username, language_code, message) VALUES (?, ?, ?, ?)",
-        (user_id, username, language_code, message),
+        "INSERT INTO support_messages (user_id, username, language_code, message, ticket_id) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (user_id, username, language_code, message, ticket_id),
     )
     conn.commit()
+    _remember_language(user_id, language_code)
 
 
 def get_user_language(user_id: int) -> str:
     """Return last known language for the user."""
+    lang = _language_cache.get(user_id)
+    if lang is not None:
+        return lang
+    conn = get_conn()
     cur = conn.execute(
         "SELECT language_code FROM support_messages WHERE user_id = ? ORDER BY timestamp DESC LIMIT 1",
         (user_id,),
     )
     row = cur.fetchone()
-    return row[0] if row else "en"
+    lang = row[0] if row else "en"
+    _remember_language(user_id, lang)
+    return lang
 
 
-# Ensure tables are created when the module is imported
-init_db()
+def open_ticket(
+    user_id: int, username: str, language_code: str, kind: str, message: str
+) -> int:
+    """Attach the message to the user's open ticket of this kind or open a new one."""
+    conn = get_conn()
+    cur = conn.execute(
+        "SELECT id FROM tickets WHERE user_id = ? AND status = 'open' AND kind = ? "
+        "ORDER BY id DESC LIMIT 1",
+        (user_id, kind),
+    )
+    row = cur.fetchone()
+    if row:
+        ticket_id = row[0]
+        conn.execute(
+            "UPDATE tickets SET updated_at = CURRENT_TIMESTAMP, language_code = ? WHERE id = ?",
+            (language_code, ticket_id),
+        )
+    else:
+        cur = conn.execute(
+            "INSERT INTO tickets (user_id, username, language_code, kind) VALUES (?, ?, ?, ?)",
+            (user_id, username, language_code, kind),
+        )
+        ticket_id = cur.lastrowid
+    log_support_message(user_id, username, language_code, message, ticket_id)
+    return ticket_id
+
+
+def get_open_ticket_id(user_id: int) -> Optional[int]:
+    """Return the newest open ticket of the user, if any."""
+    conn = get_conn()
+    cur = conn.execute(
+        "SELECT id FROM tickets WHERE user_id = ? AND status = 'open' ORDER BY id DESC LIMIT 1",
+        (user_id,),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
 
 
+def get_ticket(ticket_id: int) -> Optional[Dict]:
+    """Return ticket dictionary or None."""
+    conn = get_conn()
+    cur = conn.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,))
+    row = cur.fetchone()
+    if row:
+        keys = [col[0] for col in cur.description]
+        return dict(zip(keys, row))
+    return None
+
+
+def list_tickets(status: str = "open", limit: int = 20) -> List[Dict]:
+    """Return the oldest tickets with the given status."""
+    conn = get_conn()
+    cur = conn.execute(
+        "SELECT * FROM tickets WHERE status = ? ORDER BY id LIMIT ?",
+        (status, limit),
+    )
+    keys = [col[0] for col in cur.description]
+    return [dict(zip(keys, row)) for row in cur.fetchall()]
+
+
+def set_ticket_status(ticket_id: int, status: str) -> None:
+    """Change ticket status to one of TICKET_STATUSES."""
+    conn = get_conn()
+    if status not in TICKET_STATUSES:
+        raise ValueError(f"Unknown ticket status: {status}")
+    conn.execute(
+        "UPDATE tickets SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (status, ticket_id),
+    )
+    conn.commit()
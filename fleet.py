@@ -0,0 +1,229 @@
+"""Run a set of language bots that can change while the process is running.
+
+The fleet is described by ``BOTS_CONFIG`` (``bots.json`` by default)::
+
+    [{"lang": "tr", "token_env": "TOKEN_TURKEY"}, {"lang": "kz", "token": "123:ABC"}]
+
+The file is checked every ``FLEET_WATCH_INTERVAL`` seconds. New entries are
+started, removed ones are drained and stopped, and an entry whose token or
+language changed is restarted; the other bots keep running. A bot that fails
+to start is retried on every check. Without the file the bots come from the
+``TOKEN_*`` variables. All bots share one HTTP session, and the DB
+connection, OpenAI client and quota ledger are process-wide.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import Message
+
+from analytics import ADMIN_IDS
+from lifecycle import Lifecycle
+
+BOTS_CONFIG = os.getenv("BOTS_CONFIG", "bots.json")
+WATCH_INTERVAL = float(os.getenv("FLEET_WATCH_INTERVAL", "5"))
+
+ENV_BOTS = [
+    {"token_env": "TOKEN_TURKEY", "lang": "tr"},
+    {"token_env": "TOKEN_INDONESIA", "lang": "id"},
+    {"token_env": "TOKEN_ARABIC", "lang": "ar"},
+    {"token_env": "TOKEN_VIETNAM", "lang": "vi"},
+    {"token_env": "TOKEN_BRAZIL", "lang": "pt"},
+]
+
+logger = logging.getLogger(__name__)
+
+
+def load_config(path: str = BOTS_CONFIG) -> Dict[str, str]:
+    """Return ``{token: lang}`` for every configured bot that has a token."""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    else:
+        entries = ENV_BOTS
+    bots = {}
+    for entry in entries:
+        token = entry.get("token") or os.getenv(entry.get("token_env", ""), "")
+        if token:
+            bots[token] = entry["lang"]
+        else:
+            logger.warning("Token for language %s is not set", entry.get("lang"))
+    return bots
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class BotRunner:
+    """One polling bot with its own dispatcher and in-flight tracking."""
+
+    def __init__(self, lang: str, bot: Bot, dp: Dispatcher) -> None:
+        self.lang = lang
+        self.bot = bot
+        self.dp = dp
+        self.lifecycle = Lifecycle()
+        self.task: Optional[asyncio.Task] = None
+        self.username = ""
+        self.started_at = 0.0
+        self.start_seconds = 0.0
+        # Python memory allocated while starting, known only under tracemalloc
+        self.memory_bytes: Optional[int] = None
+
+
+class FleetManager:
+    """Starts, stops and restarts bots to match the configuration."""
+
+    def __init__(
+        self,
+        factory: Callable[[Bot, str], Dispatcher],
+        path: str = BOTS_CONFIG,
+        interval: float = WATCH_INTERVAL,
+        session: Optional[AiohttpSession] = None,
+    ) -> None:
+        self.factory = factory
+        self.path = path
+        self.interval = interval
+        self.session = session or AiohttpSession()
+        self.runners: Dict[str, BotRunner] = {}
+        # Last applied {token: lang}, bots missing from runners are retried
+        self._wanted: Dict[str, str] = {}
+        self._mtime: Optional[float] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._apply_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Start the configured bots and begin watching the configuration."""
+        self._mtime = self._config_mtime()
+        await self.apply(load_config(self.path))
+        self._watch_task = asyncio.create_task(self._watch())
+
+    def _config_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            mtime = self._config_mtime()
+            try:
+                if mtime != self._mtime:
+                    self._mtime = mtime
+                    await self.apply(load_config(self.path))
+                elif any(token not in self.runners for token in self._wanted):
+                    # A bot that failed to start, e.g. on a Telegram error, gets another try
+                    await self.apply(self._wanted)
+            except Exception:
+                logger.exception("Failed to apply fleet configuration, keeping current bots")
+
+    async def apply(self, bots: Dict[str, str]) -> None:
+        """Make the running bots match ``{token: lang}``."""
+        async with self._apply_lock:
+            self._wanted = bots
+            stale = [
+                token for token, runner in self.runners.items() if bots.get(token) != runner.lang
+            ]
+            await asyncio.gather(*(self.stop_bot(token) for token in stale))
+            await asyncio.gather(
+                *(
+                    self.start_bot(token, lang)
+                    for token, lang in bots.items()
+                    if token not in self.runners
+                )
+            )
+
+    async def start_bot(self, token: str, lang: str) -> None:
+        tracing = tracemalloc.is_tracing()
+        memory_before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        started = time.perf_counter()
+        bot = Bot(token=token, session=self.session)
+        dp = self.factory(bot, lang)
+        dp["fleet"] = self
+        runner = BotRunner(lang, bot, dp)
+        try:
+            me = await bot.me()
+        except Exception:
+            logger.exception("Bot for language %s failed to start, retrying in %gs", lang, self.interval)
+            return
+        runner.username = me.username or ""
+        runner.task = asyncio.create_task(
+            runner.lifecycle.run_polling(dp, bot, close_session=False)
+        )
+        runner.task.add_done_callback(lambda task, r=runner: self._on_exit(r, task))
+        runner.started_at = time.time()
+        runner.start_seconds = time.perf_counter() - started
+        if tracing:
+            runner.memory_bytes = tracemalloc.get_traced_memory()[0] - memory_before
+        self.runners[token] = runner
+        logger.info(
+            "Started @%s (%s) in %.2fs, memory %s",
+            runner.username,
+            lang,
+            runner.start_seconds,
+            "n/a" if runner.memory_bytes is None else f"{runner.memory_bytes // 1024} KiB",
+        )
+
+    def _on_exit(self, runner: BotRunner, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Bot @%s stopped with an error", runner.username, exc_info=task.exception())
+
+    async def stop_bot(self, token: str) -> None:
+        """Stop polling for the bot, drain its handlers and forget it."""
+        runner = self.runners.pop(token, None)
+        if runner is None:
+            return
+        await runner.lifecycle.shutdown()
+        if runner.task is not None:
+            await asyncio.gather(runner.task, return_exceptions=True)
+        logger.info("Stopped @%s (%s)", runner.username, runner.lang)
+
+    def report(self) -> List[Dict]:
+        """Start time and memory of every running bot."""
+        return [
+            {
+                "username": runner.username,
+                "lang": runner.lang,
+                "uptime_s": round(time.time() - runner.started_at),
+                "start_s": round(runner.start_seconds, 3),
+                "memory_kib": None if runner.memory_bytes is None else runner.memory_bytes // 1024,
+            }
+            for runner in self.runners.values()
+        ]
+
+    async def close(self) -> None:
+        """Stop watching, drain every bot and close the shared session."""
+        async with self._apply_lock:
+            # Holding the lock means the watcher is not halfway through an apply
+            if self._watch_task is not None:
+                self._watch_task.cancel()
+                await asyncio.gather(self._watch_task, return_exceptions=True)
+                self._watch_task = None
+            await asyncio.gather(*(self.stop_bot(token) for token in list(self.runners)))
+        await self.session.close()
+
+
+async def fleet_command(message: Message, fleet: FleetManager) -> None:
+    """/fleet - running bots with start time and memory, for admins."""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    lines = [
+        f"@{r['username']} [{r['lang']}] up {r['uptime_s']}s, start {r['start_s']}s, "
+        f"mem {'n/a' if r['memory_kib'] is None else str(r['memory_kib']) + ' KiB'}"
+        for r in fleet.report()
+    ]
+    rss = _rss_bytes()
+    if rss is not None:
+        lines.append(f"process RSS {rss // (1024 * 1024)} MiB")
+    await message.answer("\n".join(lines) or "Нет запущенных ботов")
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database import DB_PATH
+
+# Abandoned conversations are forgotten after this many seconds
+FSM_TTL = int(os.getenv("FSM_TTL", "86400"))
+# How long a state read from SQLite is trusted without re-reading it.
+# Set to 0 when several workers share one database.
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "10"))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+# Expired rows are purged once per this many writes
+PURGE_EVERY = 1000
+
+_Key = Tuple[int, int, int, int, str]
+_Record = Tuple[Optional[int], Dict[str, Any]]
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage kept in SQLite so states survive restarts.
+
+    State names are stored as small integers (``fsm_states`` table), data as
+    compact JSON or NULL when empty, and a row disappears once both are
+    cleared. Rows expire ``ttl`` seconds after the last write. Reads go
+    through a small in-process cache that writes update directly.
+    """
+
+    def __init__(
+        self,
+        path: str = DB_PATH,
+        ttl: int = FSM_TTL,
+        cache_ttl: float = FSM_CACHE_TTL,
+        cache_size: int = FSM_CACHE_SIZE,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._db: Optional[aiosqlite.Connection] = None
+        self._connect_lock = asyncio.Lock()
+        self._state_ids: Dict[str, int] = {}
+        self._state_names: Dict[int, str] = {}
+        self._cache: Dict[_Key, Tuple[float, float, _Record]] = {}
+        self._writes = 0
+
+    async def _connection(self) -> aiosqlite.Connection:
+        if self._db is None:
+            async with self._connect_lock:
+                if self._db is None:
+                    db = await aiosqlite.connect(self.path)
+                    await db.execute(
+                        "CREATE TABLE IF NOT EXISTS fsm_states ("
+                        "id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)"
+                    )
+                    await db.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS fsm_data (
+                            bot_id INTEGER NOT NULL,
+                            chat_id INTEGER NOT NULL,
+                            user_id INTEGER NOT NULL,
+                            thread_id INTEGER NOT NULL,
+                            destiny TEXT NOT NULL,
+                            state INTEGER,
+                            data TEXT,
+                            expires_at INTEGER NOT NULL,
+                            PRIMARY KEY (bot_id, chat_id, user_id, thread_id, destiny)
+                        ) WITHOUT ROWID
+                        """
+                    )
+                    await db.execute(
+                        "CREATE INDEX IF NOT EXISTS idx_fsm_data_expires ON fsm_data (expires_at)"
+                    )
+                    await db.commit()
+                    async with db.execute("SELECT id, name FROM fsm_states") as cur:
+                        for state_id, name in await cur.fetchall():
+                            self._state_ids[name] = state_id
+                            self._state_names[state_id] = name
+                    self._db = db
+        return self._db
+
+    @staticmethod
+    def _key(key: StorageKey) -> _Key:
+        destiny = key.destiny
+        business_id = getattr(key, "business_connection_id", None)
+        if business_id:
+            destiny = f"{destiny}:{business_id}"
+        return key.bot_id, key.chat_id, key.user_id, key.thread_id or 0, destiny
+
+    async def _state_id(self, name: str) -> int:
+        state_id = self._state_ids.get(name)
+        if state_id is None:
+            db = await self._connection()
+            await db.execute("INSERT OR IGNORE INTO fsm_states (name) VALUES (?)", (name,))
+            await db.commit()
+            async with db.execute("SELECT id FROM fsm_states WHERE name = ?", (name,)) as cur:
+                state_id = (await cur.fetchone())[0]
+            self._state_ids[name] = state_id
+            self._state_names[state_id] = name
+        return state_id
+
+    async def _state_name(self, state_id: int) -> Optional[str]:
+        name = self._state_names.get(state_id)
+        if name is None:
+            # Registered by another worker after our connection was opened
+            db = await self._connection()
+            async with db.execute("SELECT name FROM fsm_states WHERE id = ?", (state_id,)) as cur:
+                row = await cur.fetchone()
+            if row:
+                name = row[0]
+                self._state_ids[name] = state_id
+                self._state_names[state_id] = name
+        return name
+
+    def _remember(self, k: _Key, record: _Record, expires_at: float) -> None:
+        self._cache.pop(k, None)
+        self._cache[k] = (time.monotonic(), expires_at, record)
+        if len(self._cache) > self.cache_size:
+            del self._cache[next(iter(self._cache))]
+
+    async def _load(self, k: _Key) -> _Record:
+        now = time.time()
+        cached = self._cache.get(k)
+        if cached is not None:
+            cached_at, expires_at, record = cached
+            if time.monotonic() - cached_at < self.cache_ttl and expires_at > now:
+                return record
+        db = await self._connection()
+        async with db.execute(
+            "SELECT state, data, expires_at FROM fsm_data WHERE bot_id = ? AND chat_id = ? "
+            "AND user_id = ? AND thread_id = ? AND destiny = ?",
+            k,
+        ) as cur:
+            row = await cur.fetchone()
+        if row is None or row[2] <= now:
+            record: _Record = (None, {})
+            expires_at = now + self.ttl
+        else:
+            record = (row[0], json.loads(row[1]) if row[1] else {})
+            expires_at = row[2]
+        self._remember(k, record, expires_at)
+        return record
+
+    async def _store(self, k: _Key, state_id: Optional[int], data: Dict[str, Any]) -> None:
+        db = await self._connection()
+        expires_at = int(time.time()) + self.ttl
+        if state_id is None and not data:
+            await db.execute(
+                "DELETE FROM fsm_data WHERE bot_id = ? AND chat_id = ? AND user_id = ? "
+                "AND thread_id = ? AND destiny = ?",
+                k,
+            )
+        else:
+            await db.execute(
+                "INSERT OR REPLACE INTO fsm_data "
+                "(bot_id, chat_id, user_id, thread_id, destiny, state, data, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                k + (
+                    state_id,
+                    json.dumps(data, ensure_ascii=False, separators=(",", ":")) if data else None,
+                    expires_at,
+                ),
+            )
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            await db.execute("DELETE FROM fsm_data WHERE expires_at <= ?", (int(time.time()),))
+        await db.commit()
+        self._remember(k, (state_id, data), expires_at)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self._key(key)
+        name = state.state if isinstance(state, State) else state
+        state_id = await self._state_id(name) if name is not None else None
+        _, data = await self._load(k)
+        await self._store(k, state_id, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state_id, _ = await self._load(self._key(key))
+        if state_id is None:
+            return None
+        return await self._state_name(state_id)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        k = self._key(key)
+        state_id, _ = await self._load(k)
+        await self._store(k, state_id, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self._key(key))
+        return dict(data)
+
+    async def purge_expired(self) -> int:
+        """Delete expired rows and return how many were removed."""
+        db = await self._connection()
+        cur = await db.execute("DELETE FROM fsm_data WHERE expires_at <= ?", (int(time.time()),))
+        await db.commit()
+        return cur.rowcount
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self.purge_expired()
+            await self._db.close()
+            self._db = None
+        self._cache.clear()
+
+
+def create_storage() -> BaseStorage:
+    """Return Redis storage when REDIS_URL is set, otherwise SQLite storage."""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        # Optional dependency: pip install redis
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        return RedisStorage.from_url(redis_url, state_ttl=FSM_TTL, data_ttl=FSM_TTL)
+    return SQLiteStorage()
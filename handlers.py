@@ -1,30 +1,30 @@
+import os
 import re
 from aiogram import Router, Bot
 from aiogram.filters import CommandStart, Command
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 
-from translations import get_translation, SUPPORTED_LANGS
+from i18n import button_action, keyboard, resolve_lang, text
 from utils import translate_text
-from database import init_db, log_support_message, get_user_language
-
-OWNER = "@VasiliiOz"
+from database import (
+    log_support_message,
+    get_user_language,
+    open_ticket,
+    get_open_ticket_id,
+    get_ticket,
+    list_tickets,
+    set_ticket_status,
+)
+from tickets import TicketDigest
+
+# Telegram user id of the owner, the digest goes to the private chat with them
+OWNER_ID = int(os.getenv("SUPPORT_OWNER_ID", "0"))
 
 router = Router()
 
 
-def menu_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="🧾 Проблема с оплатой")],
-            [KeyboardButton(text="❓ Другое")],
-            [KeyboardButton(text="📨 Связаться с человеком")],
-        ],
-        resize_keyboard=True,
-    )
-
-
 class Form(StatesGroup):
     payment = State()
     support = State()
@@ -32,87 +32,109 @@ class Form(StatesGroup):
 
 @router.message(CommandStart())
 async def start_handler(message: Message, state: FSMContext) -> None:
-    init_db()
     await state.clear()
-    lang = message.from_user.language_code or "en"
-    lang = lang if lang in SUPPORTED_LANGS else "en"
-    await message.answer(get_translation(lang, "start"), reply_markup=menu_keyboard())
+    lang = resolve_lang(message.from_user.language_code)
+    await message.answer(text(lang, "start"), reply_markup=keyboard(lang, "menu"))
 
 
 @router.message(Command("help"))
 async def help_handler(message: Message) -> None:
-    lang = message.from_user.language_code or "en"
-    lang = lang if lang in SUPPORTED_LANGS else "en"
-    await message.answer(get_translation(lang, "help"))
+    lang = resolve_lang(message.from_user.language_code)
+    await message.answer(text(lang, "help"))
 
 
 @router.message(Command("paysupport"))
 async def paysupport_command(message: Message, state: FSMContext) -> None:
-    lang = message.from_user.language_code or "en"
-    lang = lang if lang in SUPPORTED_LANGS else "en"
-    await message.answer(get_translation(lang, "ask_payment"))
+    lang = resolve_lang(message.from_user.language_code)
+    # Stored before the prompt, so a quick answer already finds the state
     await state.set_state(Form.payment)
+    await message.answer(text(lang, "ask_payment"))
 
 
 @router.message(Command("support"))
 async def support_command(message: Message, state: FSMContext) -> None:
-    lang = message.from_user.language_code or "en"
-    lang = lang if lang in SUPPORTED_LANGS else "en"
-    await message.answer(get_translation(lang, "ask_support"))
+    lang = resolve_lang(message.from_user.language_code)
     await state.set_state(Form.support)
+    await message.answer(text(lang, "ask_support"))
+
+
+@router.message(Command("tickets"))
+async def tickets_command(message: Message) -> None:
+    if message.from_user.id != OWNER_ID:
+        return
+    tickets = list_tickets("open")
+    if not tickets:
+        await message.answer("Открытых тикетов нет")
+        return
+    await message.answer(
+        "\n".join(
+            f"#{t['id']} {t['kind']} from {t['user_id']} [{t['language_code']}] {t['updated_at']}"
+            for t in tickets
+        )
+    )
 
 
-@router.message(lambda m: m.text == "🧾 Проблема с оплатой")
+@router.message(lambda m: button_action(m.text) == "menu_payment")
 async def paysupport_button(message: Message, state: FSMContext) -> None:
     await paysupport_command(message, state)
 
 
-@router.message(lambda m: m.text == "❓ Другое")
+@router.message(lambda m: button_action(m.text) == "menu_other")
 async def support_button(message: Message, state: FSMContext) -> None:
     await support_command(message, state)
 
 
-@router.message(lambda m: m.text == "📨 Связаться с человеком")
+@router.message(lambda m: button_action(m.text) == "menu_contact")
 async def contact_button(message: Message) -> None:
     await message.answer("https://t.me/VasiliiOz")
 
 
-@router.message(Form.payment)
-async def handle_payment(message: Message, state: FSMContext, bot: Bot) -> None:
-    lang = message.from_user.language_code or "en"
-    lang = lang if lang in SUPPORTED_LANGS else "en"
-    log_support_message(message.from_user.id, message.from_user.username or "", lang, message.text)
-    text_ru = await translate_text(message.text, "ru")
-    await bot.send_message(OWNER, f"pay from {message.from_user.id}: {text_ru}")
+async def _submit_ticket(message: Message, state: FSMContext, digest: TicketDigest, kind: str) -> None:
+    lang = resolve_lang(message.from_user.language_code)
+    body = message.text or ""
+    ticket_id = open_ticket(message.from_user.id, message.from_user.username or "", lang, kind, body)
+    digest.add(ticket_id, message.from_user.id, kind, lang, body)
     await state.clear()
     await message.answer("✅")
 
 
+@router.message(Form.payment)
+async def handle_payment(message: Message, state: FSMContext, digest: TicketDigest) -> None:
+    await _submit_ticket(message, state, digest, "pay")
+
+
 @router.message(Form.support)
-async def handle_support(message: Message, state: FSMContext, bot: Bot) -> None:
-    lang = message.from_user.language_code or "en"
-    lang = lang if lang in SUPPORTED_LANGS else "en"
-    log_support_message(message.from_user.id, message.from_user.username or "", lang, message.text)
-    text_ru = await translate_text(message.text, "ru")
-    await bot.send_message(OWNER, f"support from {message.from_user.id}: {text_ru}")
-    await state.clear()
-    await message.answer("✅")
+async def handle_support(message: Message, state: FSMContext, digest: TicketDigest) -> None:
+    await _submit_ticket(message, state, digest, "support")
 
 
 @router.message()
 async def default_handler(message: Message, bot: Bot) -> None:
-    if message.from_user.username == OWNER.lstrip("@"):
-        match = re.match(r"reply:(\d+)\s+(.*)", message.text or "", re.DOTALL)
+    if OWNER_ID and message.from_user.id == OWNER_ID:
+        match = re.match(r"reply:(#?)(\d+)\s+(.*)", message.text or "", re.DOTALL)
         if match:
-            user_id = int(match.group(1))
-            text = match.group(2)
-            lang = get_user_language(user_id)
-            translated = await translate_text(text, lang)
+            ticket_id = None
+            if match.group(1):
+                ticket = get_ticket(int(match.group(2)))
+                if ticket is None:
+                    await message.answer("Тикет не найден")
+                    return
+                ticket_id = ticket["id"]
+                user_id = ticket["user_id"]
+                lang = ticket["language_code"] or "en"
+            else:
+                user_id = int(match.group(2))
+                lang = get_user_language(user_id)
+            reply_text = match.group(3)
+            translated = await translate_text(reply_text, lang)
             await bot.send_message(user_id, translated)
+            if ticket_id is not None:
+                set_ticket_status(ticket_id, "answered")
             return
     log_support_message(
         message.from_user.id,
         message.from_user.username or "",
         message.from_user.language_code or "en",
         message.text or "",
+        get_open_ticket_id(message.from_user.id),
     )
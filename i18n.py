@@ -0,0 +1,177 @@
+"""Localisation catalogue shared by the main bots and the support bot.
+
+Strings live in ``locales/<lang>.json``; a file may name a parent language
+with the ``_fallback`` key (``en`` by default) and gives the English name of
+its language, used in translation prompts, in ``_name``. The catalogue is compiled
+once: fallback chains are merged, keys are interned and keyboards are built
+per language, so every lookup is a plain dictionary read.
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+from typing import Dict, Optional, Tuple
+
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+)
+
+LOCALES_DIR = os.getenv(
+    "LOCALES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+)
+DEFAULT_LANG = "en"
+PURCHASE_URL = "https://t.me/your_bot?start=pay"
+
+# Keys of the support bot menu buttons; their labels are matched in any language
+MENU_BUTTONS = ("menu_payment", "menu_other", "menu_contact")
+
+
+class Catalogue:
+    """Fully resolved strings and keyboards for every known language."""
+
+    __slots__ = ("strings", "langs", "names", "keyboards", "buttons")
+
+    def __init__(
+        self,
+        strings: Dict[str, Dict[str, str]],
+        names: Dict[str, str],
+        keyboards: Dict[str, Dict[str, object]],
+        buttons: Dict[str, str],
+    ) -> None:
+        self.strings = strings
+        self.langs = frozenset(strings)
+        self.names = names
+        self.keyboards = keyboards
+        self.buttons = buttons
+
+
+def _load_sources(path: str) -> Dict[str, Dict[str, str]]:
+    sources = {}
+    for name in sorted(os.listdir(path)):
+        lang, ext = os.path.splitext(name)
+        if ext != ".json":
+            continue
+        with open(os.path.join(path, name), "r", encoding="utf-8") as f:
+            sources[sys.intern(lang)] = json.load(f)
+    return sources
+
+
+def _resolve(
+    lang: str, sources: Dict[str, Dict[str, str]], chain: Tuple[str, ...] = ()
+) -> Dict[str, str]:
+    data = sources[lang]
+    parent = data.get("_fallback", None if lang == DEFAULT_LANG else DEFAULT_LANG)
+    merged: Dict[str, str] = {}
+    if parent:
+        if parent in chain or parent == lang:
+            raise ValueError(f"Fallback cycle in locales: {' -> '.join(chain + (lang, parent))}")
+        if parent not in sources:
+            raise ValueError(f"Locale {lang} falls back to unknown locale {parent}")
+        merged.update(_resolve(parent, sources, chain + (lang,)))
+    for key, value in data.items():
+        if not key.startswith("_"):
+            merged[sys.intern(key)] = value
+    return merged
+
+
+def _build_keyboards(strings: Dict[str, str]) -> Dict[str, object]:
+    return {
+        "menu": ReplyKeyboardMarkup(
+            keyboard=[[KeyboardButton(text=strings[key])] for key in MENU_BUTTONS],
+            resize_keyboard=True,
+        ),
+        "reply": ReplyKeyboardMarkup(
+            keyboard=[[KeyboardButton(text=strings["reply_button"])]],
+            resize_keyboard=True,
+        ),
+        "purchase": InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text=strings["purchase_button"], url=PURCHASE_URL)]
+            ]
+        ),
+    }
+
+
+def compile_catalogue(path: str = LOCALES_DIR) -> Catalogue:
+    """Load every locale file under ``path`` and build a new catalogue."""
+    sources = _load_sources(path)
+    if DEFAULT_LANG not in sources:
+        raise RuntimeError(f"Default locale {DEFAULT_LANG}.json not found in {path}")
+    strings = {lang: _resolve(lang, sources) for lang in sources}
+    names = {lang: data.get("_name", lang) for lang, data in sources.items()}
+    keyboards = {lang: _build_keyboards(s) for lang, s in strings.items()}
+    buttons = {s[key]: sys.intern(key) for s in strings.values() for key in MENU_BUTTONS}
+    return Catalogue(strings, names, keyboards, buttons)
+
+
+_catalogue = compile_catalogue()
+
+
+def reload(path: str = LOCALES_DIR) -> Catalogue:
+    """Recompile locale files and swap the catalogue in a single assignment.
+
+    Readers keep using the previous catalogue until the new one is complete;
+    a broken locale file leaves the current catalogue in place.
+    """
+    global _catalogue
+    catalogue = compile_catalogue(path)
+    _catalogue = catalogue
+    logging.getLogger(__name__).info("Locales reloaded: %s", ", ".join(sorted(catalogue.langs)))
+    return catalogue
+
+
+def _reload_logged() -> None:
+    try:
+        reload()
+    except Exception:
+        logging.getLogger(__name__).exception("Locale reload failed, keeping current catalogue")
+
+
+def reload_on_sighup() -> None:
+    """Reload locales whenever the process receives SIGHUP (POSIX only)."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload_logged)
+    except (AttributeError, NotImplementedError):
+        logging.getLogger(__name__).info("SIGHUP locale reload is not available here")
+
+
+def supported_langs() -> frozenset:
+    return _catalogue.langs
+
+
+def resolve_lang(code: Optional[str]) -> str:
+    """Return ``code`` when a locale exists for it, otherwise the default."""
+    return code if code in _catalogue.langs else DEFAULT_LANG
+
+
+def language_name(lang: str) -> str:
+    """Return the English name of ``lang`` from its ``_name`` key."""
+    names = _catalogue.names
+    return names.get(lang) or names[DEFAULT_LANG]
+
+
+def strings(lang: str) -> Dict[str, str]:
+    """Return the resolved string table for ``lang``. Do not modify it."""
+    tables = _catalogue.strings
+    return tables.get(lang) or tables[DEFAULT_LANG]
+
+
+def text(lang: str, key: str) -> str:
+    tables = _catalogue.strings
+    return (tables.get(lang) or tables[DEFAULT_LANG]).get(key, "")
+
+
+def keyboard(lang: str, name: str):
+    """Return the prebuilt ``menu``, ``reply`` or ``purchase`` keyboard."""
+    keyboards = _catalogue.keyboards
+    return (keyboards.get(lang) or keyboards[DEFAULT_LANG])[name]
+
+
+def button_action(label: Optional[str]) -> Optional[str]:
+    """Map a menu button label in any language to its key."""
+    return _catalogue.buttons.get(label)
@@ -0,0 +1,128 @@
+import asyncio
+import inspect
+import logging
+import os
+import signal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject
+
+# Seconds in-flight handlers get to finish after SIGTERM before they are cancelled
+DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))
+
+logger = logging.getLogger(__name__)
+
+ShutdownCallback = Callable[[], Union[None, Awaitable[None]]]
+
+
+class Lifecycle(BaseMiddleware):
+    """Tracks in-flight updates of every dispatcher and shuts them down in order.
+
+    On SIGTERM/SIGINT polling stops first, so no new updates are taken. Running
+    handlers then get ``drain_timeout`` seconds to finish; the rest are
+    cancelled, which lets them undo partial work. Finally the shutdown
+    callbacks run in reverse order of registration, like ``ExitStack``.
+    """
+
+    def __init__(self, drain_timeout: float = DRAIN_TIMEOUT) -> None:
+        self.drain_timeout = drain_timeout
+        self.dispatchers: List[Dispatcher] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self._callbacks: List[ShutdownCallback] = []
+        self._stopping = False
+        self._stop_requested = asyncio.Event()
+        self._stop_task: Optional[asyncio.Task] = None
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            self._tasks.discard(task)
+
+    def on_shutdown(self, callback: ShutdownCallback) -> None:
+        """Register a sync or async callable to run after draining."""
+        self._callbacks.append(callback)
+
+    def install_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                logger.info("Signal %s cannot be handled on this platform", sig)
+
+    async def wait(self) -> None:
+        """Block until SIGTERM/SIGINT or ``request_stop``."""
+        await self._stop_requested.wait()
+
+    async def run_polling(self, dp: Dispatcher, bot: Bot, close_session: bool = True) -> None:
+        """Poll updates for ``bot`` until shutdown is requested.
+
+        Pass ``close_session=False`` when the HTTP session is shared with other bots.
+        """
+        dp.update.outer_middleware(self)
+        self.dispatchers.append(dp)
+        if close_session:
+            self.on_shutdown(bot.session.close)
+        if self._stopping:
+            return
+        await dp.start_polling(bot, handle_signals=False, close_bot_session=False)
+
+    def request_stop(self) -> None:
+        if self._stopping:
+            return
+        logger.info("Shutdown requested, stopping pollers")
+        self._stopping = True
+        self._stop_requested.set()
+        self._stop_task = asyncio.create_task(self._stop_polling())
+
+    async def _stop_polling(self) -> None:
+        for dp in self.dispatchers:
+            try:
+                await dp.stop_polling()
+            except RuntimeError:
+                # Polling of this dispatcher has not started or already ended
+                pass
+
+    async def drain(self) -> None:
+        """Wait for in-flight handlers, cancelling those past the deadline."""
+        pending = {task for task in self._tasks if not task.done()}
+        if not pending:
+            return
+        logger.info("Waiting for %d in-flight updates", len(pending))
+        _, pending = await asyncio.wait(pending, timeout=self.drain_timeout)
+        if pending:
+            logger.warning("Cancelling %d updates after %gs", len(pending), self.drain_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def shutdown(self) -> None:
+        """Stop polling, drain handlers and run the shutdown callbacks."""
+        self._stopping = True
+        self._stop_requested.set()
+        if self._stop_task is None:
+            self._stop_task = asyncio.create_task(self._stop_polling())
+        await self._stop_task
+        await self.drain()
+        while self._callbacks:
+            callback = self._callbacks.pop()
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Shutdown callback %r failed", callback)
+        logger.info("Shutdown complete")
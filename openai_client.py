@@ -1,12 +1,183 @@
+import asyncio
+import collections
+import logging
 import os
-from openai import AsyncOpenAI
+import threading
+from typing import Deque, Dict, Optional
 
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+DEFAULT_MODEL = "gpt-3.5-turbo"
 
+# A duplicate request is sent once the primary runs longer than this
+# percentile of recent latencies for its model
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# Delay used until enough latencies are collected
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "8"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+# Every request adds this many hedge tokens, up to HEDGE_BURST; a hedge costs one
+HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", "0.05"))
+HEDGE_BURST = 3
+# Optional fallback target for hedged requests
+HEDGE_MODEL = os.getenv("HEDGE_MODEL")
+HEDGE_BASE_URL = os.getenv("HEDGE_BASE_URL")
 
-async def chat(messages):
-    response = await client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=messages,
-    )
+logger = logging.getLogger(__name__)
+
+_client = None
+_hedge_client = None
+_client_lock = threading.Lock()
+
+_latencies: Dict[str, Deque[float]] = {}
+HEDGE_STATS = {"requests": 0, "hedged": 0, "hedge_won": 0}
+_hedge_tokens = float(HEDGE_BURST)
+
+
+def get_client():
+    """Return the shared AsyncOpenAI client, importing the SDK on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AsyncOpenAI
+
+                _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def get_hedge_client():
+    """Return the client for hedged requests: HEDGE_BASE_URL if set, else the shared one."""
+    global _hedge_client
+    if not HEDGE_BASE_URL:
+        return get_client()
+    if _hedge_client is None:
+        with _client_lock:
+            if _hedge_client is None:
+                from openai import AsyncOpenAI
+
+                _hedge_client = AsyncOpenAI(
+                    api_key=os.getenv("HEDGE_API_KEY") or os.getenv("OPENAI_API_KEY"),
+                    base_url=HEDGE_BASE_URL,
+                )
+    return _hedge_client
+
+
+async def warm_up() -> None:
+    """Import the SDK and build the client in a worker thread."""
+    await asyncio.to_thread(get_client)
+
+
+async def close() -> None:
+    """Close the HTTP pools of the clients that were created."""
+    global _client, _hedge_client
+    if _hedge_client is not None:
+        await _hedge_client.close()
+        _hedge_client = None
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def _hedge_delay(model: str) -> float:
+    samples = _latencies.get(model)
+    if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * HEDGE_PERCENTILE), len(ordered) - 1)]
+
+
+def _refill_hedge_tokens() -> None:
+    global _hedge_tokens
+    _hedge_tokens = min(_hedge_tokens + HEDGE_MAX_RATE, HEDGE_BURST)
+
+
+def _take_hedge_token() -> bool:
+    """Spend a token if one is left. Unused budget never grows past HEDGE_BURST."""
+    global _hedge_tokens
+    if _hedge_tokens < 1:
+        return False
+    _hedge_tokens -= 1
+    return True
+
+
+async def _request(client, model: str, messages, timeout: Optional[float], primary: bool = True):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    kwargs = {"timeout": timeout} if timeout is not None else {}
+    samples = _latencies.setdefault(model, collections.deque(maxlen=LATENCY_WINDOW))
+    try:
+        response = await client.chat.completions.create(model=model, messages=messages, **kwargs)
+    except asyncio.CancelledError:
+        # A primary that lost to its hedge took at least this long; leaving it
+        # out would pull the percentile down the more requests get hedged
+        if primary:
+            samples.append(loop.time() - started)
+        raise
+    samples.append(loop.time() - started)
+    return response
+
+
+async def create_completion(messages, model: str = DEFAULT_MODEL, deadline: Optional[float] = None):
+    """Request a chat completion that must finish before ``deadline``.
+
+    ``deadline`` is an absolute ``loop.time()`` value. When the request runs
+    past the model's p95 latency a duplicate is sent (to HEDGE_MODEL /
+    HEDGE_BASE_URL if configured), the first answer wins and the other
+    request is cancelled. Raises ``asyncio.TimeoutError`` once the deadline
+    passes.
+    """
+    loop = asyncio.get_running_loop()
+
+    def remaining() -> Optional[float]:
+        if deadline is None:
+            return None
+        left = deadline - loop.time()
+        if left <= 0:
+            raise asyncio.TimeoutError("OpenAI request deadline exceeded")
+        return left
+
+    HEDGE_STATS["requests"] += 1
+    _refill_hedge_tokens()
+    primary = asyncio.ensure_future(_request(get_client(), model, messages, remaining()))
+    pending = {primary}
+    hedge = None
+    try:
+        delay = _hedge_delay(model)
+        left = remaining()
+        # With the deadline closer than the hedge delay the wait ends on the
+        # deadline, and a hedge could not finish in time anyway
+        hedge_due = left is None or delay < left
+        done, pending = await asyncio.wait(pending, timeout=delay if hedge_due else left)
+        if not done and hedge_due:
+            # Raises once the deadline passed, so no token is spent on it
+            left = remaining()
+            if _take_hedge_token():
+                hedge_model = HEDGE_MODEL or model
+                logger.info("Hedging %s request after %.1fs with %s", model, delay, hedge_model)
+                HEDGE_STATS["hedged"] += 1
+                hedge = asyncio.ensure_future(
+                    _request(get_hedge_client(), hedge_model, messages, left, primary=False)
+                )
+                pending.add(hedge)
+        error: Optional[BaseException] = None
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        HEDGE_STATS["hedge_won"] += 1
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                raise error
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining(), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                raise asyncio.TimeoutError("OpenAI request deadline exceeded")
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def chat(messages, model: str = DEFAULT_MODEL, deadline: Optional[float] = None):
+    response = await create_completion(messages, model, deadline)
     return response.choices[0].message.content.strip()
@@ -1,8 +1,9 @@
 import os
+from typing import Optional
 
 from aiogram import Bot, Router, F
 from aiogram.types import PreCheckoutQuery, Message
-from database import get_user, mark_user_premium, conn
+from database import get_conn, get_user, mark_user_premium
 
 
 BOT_USERNAME = os.getenv("BOT_USERNAME", "your_bot")
@@ -26,16 +27,25 @@ async def generate_purchase_button(user_id: int):
     return InlineKeyboardMarkup(inline_keyboard=[[button]])
 
 
-def log_payment(user_id: int, username: str, amount: int, currency: str, transaction_id: str) -> None:
+def log_payment(
+    user_id: int,
+    username: str,
+    amount: int,
+    currency: str,
+    transaction_id: str,
+    bot_lang: Optional[str] = None,
+) -> None:
     """Store payment information in the database."""
+    conn = get_conn()
     conn.execute(
-        "INSERT INTO payments (user_id, username, amount, currency, stars_transaction_id) VALUES (?, ?, ?, ?, ?)",
-        (user_id, username, amount, currency, transaction_id),
+        "INSERT INTO payments (user_id, username, amount, currency, stars_transaction_id, bot_lang) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (user_id, username, amount, currency, transaction_id, bot_lang),
     )
     conn.commit()
 
 
-def setup_payment_handlers() -> Router:
+def setup_payment_handlers(bot_lang: Optional[str] = None) -> Router:
     """Configure payment handlers and return a router."""
     router = Router()
 
@@ -56,6 +66,7 @@ def setup_payment_handlers() -> Router:
             payment.total_amount,
             payment.currency,
             payment.telegram_payment_charge_id,
+            bot_lang,
         )
 
     return router
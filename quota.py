@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from database import add_used_messages, get_used_messages
+
+LOCK_STRIPES = int(os.getenv("QUOTA_LOCK_STRIPES", "64"))
+# Charged messages are written to users.db in one batch this often
+FLUSH_INTERVAL = float(os.getenv("QUOTA_FLUSH_INTERVAL", "2"))
+FLUSH_BATCH = int(os.getenv("QUOTA_FLUSH_BATCH", "200"))
+CACHE_SIZE = int(os.getenv("QUOTA_CACHE_SIZE", "50000"))
+
+logger = logging.getLogger(__name__)
+
+
+class Reservation:
+    """One free message held for a request until it is answered or fails."""
+
+    __slots__ = ("ledger", "user_id", "done")
+
+    def __init__(self, ledger: "QuotaLedger", user_id: int) -> None:
+        self.ledger = ledger
+        self.user_id = user_id
+        self.done = False
+
+    def commit(self) -> None:
+        """Charge the message. Later ``release`` calls do nothing."""
+        if not self.done:
+            self.done = True
+            self.ledger._commit(self.user_id)
+
+    def release(self) -> None:
+        """Return the message to the user unless it was already charged."""
+        if not self.done:
+            self.done = True
+            self.ledger._release(self.user_id)
+
+
+class QuotaLedger:
+    """Free message quota where only answered requests are charged.
+
+    ``reserve`` counts a request against the limit while it is in flight, so
+    parallel messages from one user cannot overrun it. Users are serialised
+    through a fixed set of striped locks, unrelated users rarely share one.
+    Charged messages are kept in memory and persisted by a background batch
+    writer. The cache assumes this process is the only writer of
+    ``message_count``.
+    """
+
+    def __init__(self, limit: int, stripes: int = LOCK_STRIPES) -> None:
+        self.limit = limit
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+        self._used: Dict[int, int] = {}
+        self._reserved: Dict[int, int] = {}
+        self._dirty: Dict[int, int] = {}
+        self._flushing: Dict[int, int] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def reserve(self, user_id: int) -> Optional[Reservation]:
+        """Hold one free message for the user or return None when none is left."""
+        async with self._locks[hash(user_id) % len(self._locks)]:
+            used = self._used.pop(user_id, None)
+            if used is None:
+                used = await get_used_messages(user_id)
+                self._used[user_id] = used
+                self._evict()
+            else:
+                # Reinserted so the dict stays in least recently used order
+                self._used[user_id] = used
+            reserved = self._reserved.get(user_id, 0)
+            if used + reserved >= self.limit:
+                return None
+            self._reserved[user_id] = reserved + 1
+        return Reservation(self, user_id)
+
+    def _unreserve(self, user_id: int) -> None:
+        left = self._reserved[user_id] - 1
+        if left:
+            self._reserved[user_id] = left
+        else:
+            del self._reserved[user_id]
+
+    def _commit(self, user_id: int) -> None:
+        self._unreserve(user_id)
+        self._used[user_id] = self._used.get(user_id, 0) + 1
+        self._dirty[user_id] = self._dirty.get(user_id, 0) + 1
+        if len(self._dirty) >= FLUSH_BATCH:
+            self._wake.set()
+
+    def _release(self, user_id: int) -> None:
+        self._unreserve(user_id)
+
+    def _evict(self) -> None:
+        while len(self._used) > CACHE_SIZE:
+            # Oldest first; entries with unsaved or reserved messages are skipped
+            user_id = next(
+                (
+                    user_id
+                    for user_id in self._used
+                    if user_id not in self._dirty
+                    and user_id not in self._flushing
+                    and user_id not in self._reserved
+                ),
+                None,
+            )
+            if user_id is None:
+                return
+            del self._used[user_id]
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write charged messages accumulated since the last flush."""
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        self._flushing = batch
+        try:
+            await add_used_messages(batch)
+        except Exception:
+            logger.exception("Failed to persist %d quota updates, will retry", len(batch))
+            for user_id, delta in batch.items():
+                self._dirty[user_id] = self._dirty.get(user_id, 0) + delta
+        finally:
+            self._flushing = {}
+
+    async def close(self) -> None:
+        """Stop the batch writer and persist what is left."""
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            # Let a running flush finish instead of cancelling it halfway
+            await self._task
+            self._task = None
+        await self.flush()
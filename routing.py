@@ -0,0 +1,128 @@
+"""Choose an OpenAI model per request.
+
+Translations and simple chat go to the fast model. Long or reasoning-heavy
+prompts go to the strong model for premium users. Free users always start on
+the fast model; when its answer is empty or truncated the request is retried
+once on the strong model (cascade). Decisions and latency are logged per
+route. Set ``OPENAI_BASE_URL`` to point the client at a fake server in tests.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from openai_client import create_completion
+
+FAST_MODEL = os.getenv("FAST_MODEL", "gpt-3.5-turbo")
+STRONG_MODEL = os.getenv("STRONG_MODEL", "gpt-4o")
+# Premium prompts scoring at least this much go straight to the strong model
+STRONG_THRESHOLD = float(os.getenv("ROUTER_STRONG_THRESHOLD", "0.5"))
+CASCADE_ENABLED = os.getenv("ROUTER_CASCADE", "1") != "0"
+# Prompts of this length get the full length score
+LONG_PROMPT_CHARS = 1200
+# Languages where the fast model answers noticeably worse, e.g. "ar,vi"
+STRONG_LANGS = frozenset(filter(None, os.getenv("ROUTER_STRONG_LANGS", "").split(",")))
+LANG_BOOST = 0.2
+
+REASONING_HINTS = re.compile(
+    r"\b(why|explain|prove|calculate|compare|analy[sz]e|step by step|algorithm|"
+    r"neden|açıkla|mengapa|jelaskan|tại sao|giải thích|por que|explique|почему|объясни)\b"
+    r"|لماذا|اشرح|```|\d\s*[-+*/^=]\s*\d",
+    re.IGNORECASE,
+)
+
+logger = logging.getLogger(__name__)
+
+# route name -> [requests, total ms, max ms]
+ROUTE_STATS: Dict[str, List[float]] = {}
+
+
+class Route(NamedTuple):
+    name: str
+    model: str
+    cascade: bool
+    score: float
+
+
+def classify(prompt: str) -> float:
+    """Estimate from 0 to 1 how much reasoning the prompt needs."""
+    score = min(len(prompt) / LONG_PROMPT_CHARS, 1.0) * 0.5
+    if REASONING_HINTS.search(prompt):
+        score += 0.5
+    score += min(prompt.count("?"), 2) * 0.05
+    return min(score, 1.0)
+
+
+def choose_route(prompt: str, lang: str, task: str = "chat", premium: bool = False) -> Route:
+    if task == "translate":
+        return Route("translate", FAST_MODEL, False, 0.0)
+    score = classify(prompt)
+    if lang in STRONG_LANGS:
+        score = min(score + LANG_BOOST, 1.0)
+    if premium and score >= STRONG_THRESHOLD:
+        return Route("strong", STRONG_MODEL, False, score)
+    return Route("fast", FAST_MODEL, CASCADE_ENABLED and FAST_MODEL != STRONG_MODEL, score)
+
+
+def _record(route: str, elapsed_ms: float) -> None:
+    stats = ROUTE_STATS.setdefault(route, [0, 0.0, 0.0])
+    stats[0] += 1
+    stats[1] += elapsed_ms
+    stats[2] = max(stats[2], elapsed_ms)
+
+
+def route_stats() -> Dict[str, Dict[str, float]]:
+    """Return request count, mean and max latency in ms per route."""
+    return {
+        route: {"requests": count, "mean_ms": total / count, "max_ms": worst}
+        for route, (count, total, worst) in ROUTE_STATS.items()
+        if count
+    }
+
+
+async def _call(
+    route: str, model: str, messages: List[Dict[str, str]], deadline: Optional[float]
+) -> Tuple[str, bool]:
+    started = time.perf_counter()
+    response = await create_completion(messages, model, deadline)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _record(route, elapsed_ms)
+    choice = response.choices[0]
+    answer = (choice.message.content or "").strip()
+    ok = bool(answer) and choice.finish_reason != "length"
+    logger.info("route=%s model=%s latency=%.0fms ok=%s", route, model, elapsed_ms, ok)
+    return answer, ok
+
+
+async def complete(
+    messages: List[Dict[str, str]],
+    lang: str,
+    task: str = "chat",
+    premium: bool = False,
+    deadline: Optional[float] = None,
+) -> str:
+    """Send the conversation to the model chosen for it and return the answer.
+
+    ``deadline`` is an absolute ``loop.time()`` shared by the first call and
+    the cascade; a cascade that runs out of time keeps the first answer.
+    """
+    route = choose_route(messages[-1]["content"], lang, task, premium)
+    logger.info(
+        "routing task=%s lang=%s premium=%s score=%.2f -> %s",
+        task, lang, premium, route.score, route.name,
+    )
+    answer, ok = await _call(route.name, route.model, messages, deadline)
+    if not ok and route.cascade:
+        logger.info("Escalating %s answer to %s", route.name, STRONG_MODEL)
+        try:
+            escalated, ok = await _call("cascade", STRONG_MODEL, messages, deadline)
+        except asyncio.TimeoutError:
+            if not answer:
+                raise
+            logger.info("Cascade ran out of time, keeping %s answer", route.name)
+        else:
+            if ok or not answer:
+                answer = escalated
+    return answer
@@ -1,24 +1,55 @@
 import asyncio
 import logging
 import os
+from typing import Optional
 
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 from dotenv import load_dotenv
 
-from handlers import router
+from database import close_db, init_db
+from fsm_storage import create_storage
+from handlers import OWNER_ID, router
+from i18n import reload_on_sighup
+from lifecycle import Lifecycle
+from openai_client import close as close_openai, warm_up
+from tickets import TicketDigest
 
 load_dotenv()
 
 
+def build_dispatcher(digest: TicketDigest, storage: Optional[BaseStorage] = None) -> Dispatcher:
+    """Create the support dispatcher. ``handlers.router`` can be attached only once."""
+    dp = Dispatcher(storage=storage or create_storage())
+    dp["digest"] = digest
+    dp.include_router(router)
+    return dp
+
+
 async def main() -> None:
     logging.basicConfig(level=logging.INFO)
     token = os.getenv("SUPPORT_BOT_TOKEN")
     if not token:
         raise RuntimeError("SUPPORT_BOT_TOKEN is not set")
+    if not OWNER_ID:
+        raise RuntimeError("SUPPORT_OWNER_ID is not set")
+    reload_on_sighup()
+    await asyncio.gather(asyncio.to_thread(init_db), warm_up())
     bot = Bot(token)
-    dp = Dispatcher()
-    dp.include_router(router)
-    await dp.start_polling(bot)
+    digest = TicketDigest(bot, OWNER_ID)
+    dp = build_dispatcher(digest)
+    lifecycle = Lifecycle()
+    lifecycle.install_signal_handlers()
+    lifecycle.on_shutdown(close_db)
+    lifecycle.on_shutdown(close_openai)
+    lifecycle.on_shutdown(dp.storage.close)
+    digest.start()
+    try:
+        await lifecycle.run_polling(dp, bot)
+    finally:
+        # Registered last so pending tickets are sent before the session closes
+        lifecycle.on_shutdown(digest.close)
+        await lifecycle.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+# Modules read DB_PATH on import, so point it at a scratch file first
+_TMP = tempfile.mkdtemp(prefix="ai-bot-tests-")
+os.environ["DB_PATH"] = os.path.join(_TMP, "users.db")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+import pytest_asyncio  # noqa: E402
+
+from aiogram import Bot  # noqa: E402
+
+import database  # noqa: E402
+import handlers  # noqa: E402
+import openai_client  # noqa: E402
+from fakes import FakeOpenAI, FakeTelegram  # noqa: E402
+from lifecycle import Lifecycle  # noqa: E402
+from support_bot import build_dispatcher  # noqa: E402
+
+database.init_db()
+
+TOKEN = "4242:TEST"
+OWNER_ID = 777
+
+
+@pytest.fixture(autouse=True)
+def clean_tables():
+    yield
+    for table in (
+        "users", "messages", "payments", "usage_rollup", "user_first_seen",
+        "support_messages", "tickets", "analytics_cursors",
+    ):
+        database.get_conn().execute(f"DELETE FROM {table}")
+    database.get_conn().commit()
+    database._premium_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def telegram():
+    server = FakeTelegram()
+    await server.start()
+    yield server
+    await server.close()
+
+
+@pytest_asyncio.fixture
+async def openai_server(monkeypatch):
+    """Fake OpenAI server with the shared client pointed at it."""
+    server = FakeOpenAI()
+    await server.start()
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    await openai_client.close()
+    openai_client._latencies.clear()
+    for key in openai_client.HEDGE_STATS:
+        openai_client.HEDGE_STATS[key] = 0
+    openai_client._hedge_tokens = float(openai_client.HEDGE_BURST)
+    yield server
+    await openai_client.close()
+    await server.close()
+
+
+@pytest.fixture
+def support_owner(monkeypatch):
+    monkeypatch.setattr(handlers, "OWNER_ID", OWNER_ID)
+    return OWNER_ID
+
+
+async def run_support_bot(telegram, digest, storage, messages):
+    """Send ``(user_id, text, replies)`` to a polling support bot one by one.
+
+    Waits until ``replies`` more messages were sent after each one, then
+    shuts the bot down.
+    """
+    bot = Bot(TOKEN, session=telegram.session())
+    lifecycle = Lifecycle(drain_timeout=5)
+    dp = build_dispatcher(digest, storage)
+    polling = asyncio.create_task(lifecycle.run_polling(dp, bot))
+    try:
+        expected = len(telegram.sent())
+        for user_id, message, replies in messages:
+            telegram.push_message(message, user_id=user_id)
+            expected += replies
+            await telegram.wait_for("sendMessage", expected)
+    finally:
+        await lifecycle.shutdown()
+        await polling
+        # handlers.router is a module-level singleton, free it for the next dispatcher
+        dp.sub_routers.remove(handlers.router)
+        handlers.router._parent_router = None
@@ -0,0 +1,217 @@
+"""Local fake Telegram Bot API and OpenAI servers for the tests.
+
+Both run on aiohttp on a random port of 127.0.0.1 and record every request,
+so tests can drive the real aiogram ``Bot`` and ``AsyncOpenAI`` clients.
+"""
+import asyncio
+import itertools
+import json
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+# Long polls are answered at least this often so servers stop quickly
+MAX_POLL_WAIT = 0.2
+ERRORS = {
+    400: "Bad Request: chat not found",
+    403: "Forbidden: bot was blocked by the user",
+    500: "Internal Server Error",
+}
+
+
+class _Server:
+    def __init__(self) -> None:
+        self.app = web.Application()
+        self.base = ""
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, handler_cancellation=True, shutdown_timeout=0.5)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base = f"http://127.0.0.1:{port}"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class FakeTelegram(_Server):
+    """Bot API server: queued updates for ``getUpdates``, records everything else.
+
+    ``fail[method] = n`` makes the next ``n`` calls of ``method`` return 500
+    or ``fail_code[method]``, ``fail_after[method] = k`` lets ``k`` calls
+    succeed before that.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.app.router.add_post("/bot{token}/{method}", self._handle)
+        self.updates: List[Dict[str, Any]] = []
+        self.calls: List[tuple] = []
+        self.fail: Dict[str, int] = {}
+        self.fail_after: Dict[str, int] = {}
+        self.fail_code: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+
+    def session(self) -> AiohttpSession:
+        return AiohttpSession(api=TelegramAPIServer.from_base(self.base))
+
+    def push_message(self, text: str, user_id: int = 1001, language_code: str = "en") -> int:
+        update_id = next(self._ids)
+        self.updates.append(
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {
+                        "id": user_id,
+                        "is_bot": False,
+                        "first_name": "User",
+                        "language_code": language_code,
+                    },
+                    "text": text,
+                },
+            }
+        )
+        self._new_update.set()
+        return update_id
+
+    def sent(self, method: str = "sendMessage") -> List[Dict[str, str]]:
+        return [params for name, params in self.calls if name == method]
+
+    async def wait_for(self, method: str, count: int = 1, timeout: float = 5) -> None:
+        """Wait until ``method`` was called at least ``count`` times."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while len(self.sent(method)) < count:
+            if loop.time() > deadline:
+                raise AssertionError(f"{method} was called {len(self.sent(method))} times")
+            await asyncio.sleep(0.01)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        token = request.match_info["token"]
+        params = dict(await request.post())
+        self.calls.append((method, params))
+        if self.fail_after.get(method):
+            self.fail_after[method] -= 1
+        elif self.fail.get(method):
+            self.fail[method] -= 1
+            code = self.fail_code.get(method, 500)
+            return web.json_response(
+                {"ok": False, "error_code": code, "description": ERRORS[code]}, status=code
+            )
+        if method == "getUpdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+        if method == "getMe":
+            bot_id = int(token.split(":")[0])
+            result: Any = {
+                "id": bot_id,
+                "is_bot": True,
+                "first_name": "Test",
+                "username": f"test{bot_id}_bot",
+            }
+        elif method == "sendMessage":
+            chat_id = params.get("chat_id", "0")
+            result = {
+                "message_id": next(self._ids),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id) if chat_id.lstrip("-").isdigit() else 0, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates:
+            self._new_update.clear()
+            wait = min(float(params.get("timeout") or 0), MAX_POLL_WAIT)
+            try:
+                await asyncio.wait_for(self._new_update.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        return list(self.updates)
+
+
+class Reply(NamedTuple):
+    content: str = "ok"
+    delay: float = 0.0
+    finish_reason: str = "stop"
+    status: int = 200
+
+
+class FakeOpenAI(_Server):
+    """Chat completions server.
+
+    Replies are taken from ``script[model]`` in order and then from
+    ``default``. ``requests`` holds ``(model, messages)`` of every call and
+    ``cancelled`` counts requests the client gave up on before the reply.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.app.router.add_post("/v1/chat/completions", self._handle)
+        self.script: Dict[str, List[Reply]] = {}
+        self.default = Reply()
+        self.requests: List[tuple] = []
+        self.cancelled = 0
+
+    @property
+    def base_url(self) -> str:
+        return self.base + "/v1"
+
+    def models(self) -> List[str]:
+        return [model for model, _ in self.requests]
+
+    async def wait_for_requests(self, count: int = 1, timeout: float = 5) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while len(self.requests) < count:
+            if loop.time() > deadline:
+                raise AssertionError(f"OpenAI got {len(self.requests)} requests")
+            await asyncio.sleep(0.01)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = json.loads(await request.read())
+        model = body["model"]
+        self.requests.append((model, body["messages"]))
+        queue = self.script.get(model)
+        reply = queue.pop(0) if queue else self.default
+        try:
+            await asyncio.sleep(reply.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if reply.status != 200:
+            return web.json_response(
+                {"error": {"message": "fake failure", "type": "server_error"}}, status=reply.status
+            )
+        return web.json_response(
+            {
+                "id": f"chatcmpl-{len(self.requests)}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply.content},
+                        "finish_reason": reply.finish_reason,
+                    }
+                ],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        )
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+import database
+from analytics import CSV_HEADER, UsageRollup, format_summary, read_rollup, to_csv
+from payments import log_payment
+
+pytestmark = pytest.mark.asyncio
+
+
+def _day_rows():
+    cur = database.get_conn().execute(
+        "SELECT bot_lang, metric, currency, value FROM usage_rollup "
+        "WHERE period = 'day' ORDER BY bot_lang, metric, currency"
+    )
+    return cur.fetchall()
+
+
+def _today():
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+async def test_flush_counts_messages_and_new_users():
+    conn = database.get_conn()
+    # Seeded from users by init_db, so known before analytics existed
+    conn.execute("INSERT INTO user_first_seen (user_id, bot_lang) VALUES (1, 'unknown')")
+    conn.commit()
+    rollup = UsageRollup()
+    for bot_lang, user_id in (("en", 1), ("en", 2), ("en", 2), ("tr", 3)):
+        rollup.record_message(bot_lang, user_id)
+    await rollup.flush()
+
+    rollup.record_message("en", 2)
+    await rollup.flush()
+
+    assert _day_rows() == [
+        ("en", "messages", "", 4),
+        ("en", "new_users", "", 1),
+        ("tr", "messages", "", 1),
+        ("tr", "new_users", "", 1),
+    ]
+
+
+async def test_catch_up_payments_is_incremental():
+    rollup = UsageRollup()
+    log_payment(1, "a", 500, "XTR", "t1", "en")
+    log_payment(1, "a", 500, "XTR", "t2", "en")
+    log_payment(2, "b", 3, "USD", "t3", "tr")
+
+    assert await rollup.catch_up_payments() == 3
+    assert await rollup.catch_up_payments() == 0
+    log_payment(2, "b", 250, "XTR", "t4", "tr")
+    assert await rollup.catch_up_payments() == 1
+
+    last_id = database.get_conn().execute("SELECT max(id) FROM payments").fetchone()[0]
+    cursor = database.get_conn().execute(
+        "SELECT last_id FROM analytics_cursors WHERE name = 'payments'"
+    ).fetchone()
+    assert cursor == (last_id,)
+    assert _day_rows() == [
+        ("en", "conversions", "", 1),
+        ("en", "payments", "", 2),
+        ("en", "revenue", "XTR", 1000),
+        ("tr", "conversions", "", 1),
+        ("tr", "payments", "", 2),
+        ("tr", "revenue", "USD", 3),
+        ("tr", "revenue", "XTR", 250),
+    ]
+
+
+async def test_reports_read_the_rollup():
+    rollup = UsageRollup()
+    rollup.record_message("en", 7)
+    await rollup.flush()
+    log_payment(7, "c", 500, "XTR", "t5", "en")
+    await rollup.catch_up_payments()
+
+    rows = await read_rollup(1)
+    hours = await read_rollup(1, "hour")
+
+    today = _today()
+    assert rows == [
+        (today, "en", "conversions", "", 1),
+        (today, "en", "messages", "", 1),
+        (today, "en", "new_users", "", 1),
+        (today, "en", "payments", "", 1),
+        (today, "en", "revenue", "XTR", 500),
+    ]
+    assert [row[1:] for row in hours] == [row[1:] for row in rows]
+    assert all(row[0].startswith(today + " ") for row in hours)
+    assert to_csv(rows).splitlines() == [",".join(CSV_HEADER)] + [
+        ",".join(str(value) for value in row) for row in rows
+    ]
+    assert format_summary(rows) == (
+        f"{today} en: msgs 1, new 1, paid 1, conv 1, revenue 500 XTR"
+    )
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+
+import pytest
+
+import backup
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "users.db")
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, message_count INTEGER)")
+    db.executemany("INSERT INTO users VALUES (?, ?)", [(i, i % 10) for i in range(1000)])
+    db.commit()
+    db.close()
+    return path
+
+
+def test_snapshot_is_checksummed_and_restorable(source, tmp_path):
+    dest = str(tmp_path / "backups")
+
+    result = backup.snapshot(source=source, dest_dir=dest, keep=3)
+    backup.verify(result["path"])
+    target = str(tmp_path / "restored.db")
+    backup.restore(result["path"], target)
+
+    assert sorted(os.listdir(dest)) == sorted(
+        os.path.basename(p) for p in (result["path"], result["path"] + ".sha256")
+    )
+    rows = sqlite3.connect(target).execute("SELECT count(*) FROM users").fetchone()
+    assert rows == (1000,)
+
+
+def test_snapshots_in_the_same_second_get_their_own_names(source, tmp_path):
+    dest = str(tmp_path / "backups")
+
+    paths = [backup.snapshot(source=source, dest_dir=dest, keep=5)["path"] for _ in range(3)]
+
+    assert len(set(paths)) == 3
+    for path in paths:
+        backup.verify(path)
+
+
+def test_rotation_counts_only_snapshots_with_checksum(source, tmp_path):
+    dest = tmp_path / "backups"
+    dest.mkdir()
+    incomplete = dest / "users-20000101-000000.db.gz"
+    incomplete.write_bytes(b"crashed before the checksum was written")
+
+    kept = backup.snapshot(source=source, dest_dir=str(dest), keep=1)["path"]
+
+    assert backup.list_snapshots(str(dest)) == [str(incomplete), kept]
+    with pytest.raises(ValueError):
+        backup.verify(str(incomplete))
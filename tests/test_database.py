@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Point database.py at an empty file, as on the first start."""
+    path = str(tmp_path / "fresh.db")
+    conn = sqlite3.connect(path, check_same_thread=False)
+    monkeypatch.setattr(database, "_conn", conn)
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(database, "_initialized", False)
+    yield conn
+    conn.close()
+
+
+def test_first_init_switches_to_wal(fresh_db):
+    database.init_db()
+
+    assert fresh_db.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_init_with_existing_users_switches_to_wal(fresh_db):
+    # Seeding user_first_seen from users opens a transaction on this path
+    fresh_db.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, message_count INTEGER)")
+    fresh_db.execute("INSERT INTO users (user_id, message_count) VALUES (1, 3)")
+    fresh_db.commit()
+
+    database.init_db()
+
+    assert fresh_db.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert fresh_db.execute("SELECT user_id FROM user_first_seen").fetchall() == [(1,)]
+
+
+def test_import_does_not_create_the_database(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    env.pop("DB_PATH")
+
+    subprocess.run(
+        [sys.executable, "-c", "import bot, support_bot"], cwd=tmp_path, env=env, check=True
+    )
+
+    assert not (tmp_path / "users.db").exists()
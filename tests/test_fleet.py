@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+from aiogram import Dispatcher
+
+from conftest import TOKEN
+from fleet import FleetManager
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _wait_running(fleet: FleetManager, token: str, timeout: float = 5) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while token not in fleet.runners:
+        if loop.time() > deadline:
+            raise AssertionError(f"{token} did not start")
+        await asyncio.sleep(0.02)
+
+
+async def test_bot_that_failed_to_start_is_retried(telegram, tmp_path):
+    config = tmp_path / "bots.json"
+    config.write_text(json.dumps([{"lang": "en", "token": TOKEN}]), encoding="utf-8")
+    telegram.fail["getMe"] = 2
+    fleet = FleetManager(
+        lambda bot, lang: Dispatcher(), str(config), interval=0.05, session=telegram.session()
+    )
+
+    await fleet.start()
+    assert TOKEN not in fleet.runners
+    await _wait_running(fleet, TOKEN)
+    await telegram.wait_for("getUpdates")
+    await fleet.close()
+
+    assert len(telegram.sent("getMe")) == 3
+    assert not fleet.runners
+
+
+async def test_config_change_keeps_unchanged_bots_running(telegram, tmp_path):
+    other = "4343:OTHER"
+    config = tmp_path / "bots.json"
+    config.write_text(json.dumps([{"lang": "en", "token": TOKEN}]), encoding="utf-8")
+    fleet = FleetManager(
+        lambda bot, lang: Dispatcher(), str(config), interval=0.05, session=telegram.session()
+    )
+    await fleet.start()
+    first = fleet.runners[TOKEN]
+
+    config.write_text(
+        json.dumps([{"lang": "en", "token": TOKEN}, {"lang": "tr", "token": other}]),
+        encoding="utf-8",
+    )
+    await _wait_running(fleet, other)
+
+    assert fleet.runners[TOKEN] is first
+    assert not first.lifecycle.stopping
+    await fleet.close()
+    assert fleet.runners == {}
+    assert first.lifecycle.stopping
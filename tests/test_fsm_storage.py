@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+import database
+from conftest import OWNER_ID, TOKEN, run_support_bot
+from fsm_storage import SQLiteStorage
+from handlers import Form
+from i18n import text
+from tickets import TicketDigest
+
+pytestmark = pytest.mark.asyncio
+
+CUSTOMER = 4004
+KEY = StorageKey(bot_id=4242, chat_id=CUSTOMER, user_id=CUSTOMER)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "fsm.db")
+
+
+def _rows(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT typeof(state), data FROM fsm_data").fetchall()
+    finally:
+        db.close()
+
+
+async def test_state_and_data_survive_a_restart(path):
+    storage = SQLiteStorage(path)
+    await storage.set_state(KEY, Form.support)
+    await storage.set_data(KEY, {"step": 2, "text": "привет"})
+    await storage.close()
+
+    restarted = SQLiteStorage(path)
+    state = await restarted.get_state(KEY)
+    data = await restarted.get_data(KEY)
+    await restarted.close()
+
+    assert state == Form.support.state
+    assert data == {"step": 2, "text": "привет"}
+
+
+async def test_state_names_are_stored_as_ids(path):
+    storage = SQLiteStorage(path)
+    await storage.set_state(KEY, Form.payment)
+    await storage.close()
+
+    db = sqlite3.connect(path)
+    names = db.execute("SELECT name FROM fsm_states").fetchall()
+    db.close()
+    assert names == [(Form.payment.state,)]
+    assert _rows(path) == [("integer", None)]
+
+
+async def test_expired_row_reads_empty_and_is_purged(path):
+    storage = SQLiteStorage(path, ttl=0)
+    await storage.set_state(KEY, Form.support)
+    await storage.set_data(KEY, {"step": 1})
+
+    assert await storage.get_state(KEY) is None
+    assert await storage.get_data(KEY) == {}
+    assert len(_rows(path)) == 1
+    assert await storage.purge_expired() == 1
+    assert _rows(path) == []
+    await storage.close()
+
+
+async def test_clear_deletes_the_row(path):
+    storage = SQLiteStorage(path)
+    state = FSMContext(storage, KEY)
+    await state.set_state(Form.support)
+    await state.update_data(text="привет")
+
+    await state.clear()
+    await storage.close()
+
+    assert _rows(path) == []
+
+
+async def test_support_form_survives_a_dispatcher_restart(telegram, path):
+    bot = Bot(TOKEN, session=telegram.session())
+    digest = TicketDigest(bot, OWNER_ID, interval=60, max_tickets=100)
+
+    storage = SQLiteStorage(path)
+    await run_support_bot(telegram, digest, storage, [(CUSTOMER, "/support", 1)])
+    await storage.close()
+    restarted = SQLiteStorage(path)
+    await run_support_bot(telegram, digest, restarted, [(CUSTOMER, "bot is silent", 1)])
+    await restarted.close()
+    await bot.session.close()
+
+    assert [m["text"] for m in telegram.sent()] == [text("en", "ask_support"), "✅"]
+    ticket = database.get_ticket(database.get_open_ticket_id(CUSTOMER))
+    assert ticket["kind"] == "support"
+    assert _rows(path) == []
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import openai_client
+from fakes import Reply
+from openai_client import HEDGE_BURST, HEDGE_STATS, create_completion
+
+pytestmark = pytest.mark.asyncio
+
+MODEL = "gpt-test"
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture(autouse=True)
+def short_hedge_delay(monkeypatch):
+    monkeypatch.setattr(openai_client, "HEDGE_DEFAULT_DELAY", 0.1)
+
+
+def _content(response) -> str:
+    return response.choices[0].message.content
+
+
+async def test_slow_primary_is_hedged_and_cancelled(openai_server):
+    openai_server.script[MODEL] = [Reply("primary", delay=2), Reply("hedge")]
+
+    response = await create_completion(MESSAGES, MODEL)
+
+    assert _content(response) == "hedge"
+    assert HEDGE_STATS == {"requests": 1, "hedged": 1, "hedge_won": 1}
+    await asyncio.sleep(0.2)
+    assert openai_server.cancelled == 1
+    # The cancelled primary is sampled too, so the p95 does not drift down
+    assert len(openai_client._latencies[MODEL]) == 2
+    assert max(openai_client._latencies[MODEL]) >= 0.1
+
+
+async def test_hedge_budget_does_not_accumulate(openai_server, monkeypatch):
+    monkeypatch.setattr(openai_client, "HEDGE_MAX_RATE", 0.1)
+    # Keep the fixed delay so none of the quiet requests is hedged
+    monkeypatch.setattr(openai_client, "HEDGE_DEFAULT_DELAY", 0.3)
+    monkeypatch.setattr(openai_client, "HEDGE_MIN_SAMPLES", 1000)
+    for _ in range(60):
+        await create_completion(MESSAGES, MODEL)
+    assert HEDGE_STATS["hedged"] == 0
+    slow = 6
+    openai_server.script[MODEL] = [Reply("slow", delay=0.8)] * slow
+
+    responses = await asyncio.gather(*(create_completion(MESSAGES, MODEL) for _ in range(slow)))
+
+    # A lifetime ratio would allow 3 + 66 * 0.1 hedges here
+    assert HEDGE_STATS["hedged"] == HEDGE_BURST
+    assert sorted(_content(r) for r in responses).count("ok") == HEDGE_BURST
+
+
+async def test_deadline_cancels_primary_and_hedge(openai_server):
+    openai_server.default = Reply(delay=5)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await create_completion(MESSAGES, MODEL, deadline=started + 0.4)
+
+    assert loop.time() - started < 1
+    assert HEDGE_STATS["hedged"] == 1
+
+
+async def test_deadline_before_the_hedge_delay_spends_no_token(openai_server):
+    openai_server.default = Reply(delay=5)
+    loop = asyncio.get_running_loop()
+
+    for _ in range(HEDGE_BURST + 1):
+        with pytest.raises(asyncio.TimeoutError):
+            await create_completion(MESSAGES, MODEL, deadline=loop.time() + 0.05)
+
+    assert HEDGE_STATS["hedged"] == 0
+    assert openai_client._hedge_tokens == HEDGE_BURST
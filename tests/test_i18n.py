@@ -0,0 +1,31 @@
+import json
+import shutil
+
+import pytest
+
+import i18n
+from utils import translate_text
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def kazakh_locale(tmp_path):
+    path = tmp_path / "locales"
+    shutil.copytree(i18n.LOCALES_DIR, path)
+    (path / "kz.json").write_text(
+        json.dumps({"_name": "Kazakh", "welcome": "Сәлем!"}), encoding="utf-8"
+    )
+    i18n.reload(str(path))
+    yield
+    i18n.reload()
+
+
+async def test_new_locale_file_names_its_language(kazakh_locale, openai_server):
+    assert i18n.language_name("kz") == "Kazakh"
+    assert i18n.text("kz", "limit_reached") == i18n.text("en", "limit_reached")
+
+    await translate_text("Привет", "kz")
+
+    (_, messages), = openai_server.requests
+    assert "to Kazakh" in messages[0]["content"]
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import signal
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+
+from bot import build_dispatcher
+from conftest import TOKEN
+from fakes import Reply
+from lifecycle import Lifecycle
+from quota import QuotaLedger
+
+pytestmark = pytest.mark.asyncio
+
+USER_ID = 1001
+
+
+def _echo_dispatcher(handled: list, delay: float = 0.0, started: asyncio.Event = None) -> Dispatcher:
+    dp = Dispatcher()
+
+    @dp.message()
+    async def echo(message: Message) -> None:
+        if started is not None:
+            started.set()
+        await asyncio.sleep(delay)
+        handled.append(message.text)
+        await message.answer(f"echo {message.text}")
+
+    return dp
+
+
+async def test_request_stop_stops_polling(telegram):
+    handled = []
+    bot = Bot(TOKEN, session=telegram.session())
+    lifecycle = Lifecycle()
+    polling = asyncio.create_task(lifecycle.run_polling(_echo_dispatcher(handled), bot))
+    telegram.push_message("one")
+    await telegram.wait_for("sendMessage")
+
+    lifecycle.request_stop()
+    await asyncio.wait_for(polling, 5)
+    telegram.push_message("two")
+    await asyncio.sleep(0.3)
+    await lifecycle.shutdown()
+
+    assert handled == ["one"]
+    assert bot.session._session is None or bot.session._session.closed
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGTERM"), reason="POSIX signals only")
+async def test_sigterm_stops_polling(telegram):
+    bot = Bot(TOKEN, session=telegram.session())
+    lifecycle = Lifecycle()
+    lifecycle.install_signal_handlers()
+    polling = asyncio.create_task(lifecycle.run_polling(_echo_dispatcher([]), bot))
+    await telegram.wait_for("getUpdates")
+
+    os.kill(os.getpid(), signal.SIGTERM)
+    await asyncio.wait_for(polling, 5)
+
+    assert lifecycle.stopping
+    await asyncio.wait_for(lifecycle.wait(), 1)
+    await lifecycle.shutdown()
+
+
+async def test_in_flight_handler_finishes_within_drain_timeout(telegram):
+    handled = []
+    started = asyncio.Event()
+    bot = Bot(TOKEN, session=telegram.session())
+    lifecycle = Lifecycle(drain_timeout=5)
+    polling = asyncio.create_task(
+        lifecycle.run_polling(_echo_dispatcher(handled, delay=0.3, started=started), bot)
+    )
+    telegram.push_message("slow")
+    await asyncio.wait_for(started.wait(), 5)
+
+    await lifecycle.shutdown()
+    await polling
+
+    assert handled == ["slow"]
+    assert [params["text"] for params in telegram.sent()] == ["echo slow"]
+
+
+async def test_slow_handler_is_cancelled_and_releases_quota(telegram, openai_server):
+    openai_server.default = Reply(delay=30)
+    quota = QuotaLedger(limit=1)
+    bot = Bot(TOKEN, session=telegram.session())
+    lifecycle = Lifecycle(drain_timeout=0.2)
+    polling = asyncio.create_task(
+        lifecycle.run_polling(build_dispatcher(bot, "en", quota), bot)
+    )
+    telegram.push_message("hello", user_id=USER_ID)
+    await openai_server.wait_for_requests()
+    assert quota._reserved == {USER_ID: 1}
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await lifecycle.shutdown()
+    await polling
+
+    assert loop.time() - started < 2
+    assert quota._reserved == {}
+    assert quota._used.get(USER_ID, 0) == 0
+    assert not quota._dirty
+    assert await quota.reserve(USER_ID) is not None
+
+
+async def test_shutdown_callbacks_run_in_reverse_order():
+    lifecycle = Lifecycle()
+    order = []
+
+    async def close_async() -> None:
+        order.append("async")
+
+    def broken() -> None:
+        raise RuntimeError("callback failure must not stop the others")
+
+    lifecycle.on_shutdown(lambda: order.append("first"))
+    lifecycle.on_shutdown(close_async)
+    lifecycle.on_shutdown(broken)
+    lifecycle.on_shutdown(lambda: order.append("last"))
+
+    await lifecycle.shutdown()
+
+    assert order == ["last", "async", "first"]
@@ -0,0 +1,98 @@
+import asyncio
+import sqlite3
+
+import pytest
+from aiogram import Bot
+
+import database
+import quota as quota_module
+from bot import build_dispatcher
+from conftest import TOKEN
+from fakes import Reply
+from i18n import text
+from lifecycle import Lifecycle
+from quota import QuotaLedger
+
+pytestmark = pytest.mark.asyncio
+
+USER_ID = 2002
+
+
+async def _run_bot(telegram, quota, messages):
+    """Send ``messages`` one by one to a polling bot, then shut it down."""
+    bot = Bot(TOKEN, session=telegram.session())
+    lifecycle = Lifecycle(drain_timeout=5)
+    polling = asyncio.create_task(lifecycle.run_polling(build_dispatcher(bot, "en", quota), bot))
+    for count, message in enumerate(messages, 1):
+        telegram.push_message(message, user_id=USER_ID)
+        await telegram.wait_for("sendMessage", count)
+    await lifecycle.shutdown()
+    await polling
+    return [params["text"] for params in telegram.sent()]
+
+
+async def test_answered_messages_are_charged_until_the_limit(telegram, openai_server):
+    openai_server.default = Reply("answer")
+    quota = QuotaLedger(limit=1)
+
+    replies = await _run_bot(telegram, quota, ["first", "second"])
+    await quota.close()
+
+    assert replies == ["answer", text("en", "limit_reached")]
+    assert len(openai_server.requests) == 1
+    assert await database.get_used_messages(USER_ID) == 1
+
+
+async def test_failed_completion_is_not_charged(telegram, openai_server):
+    openai_server.default = Reply(status=400)
+    quota = QuotaLedger(limit=1)
+
+    replies = await _run_bot(telegram, quota, ["hello"])
+    await quota.close()
+
+    assert replies == [text("en", "connection_error")]
+    assert await database.get_used_messages(USER_ID) == 0
+    assert await quota.reserve(USER_ID) is not None
+
+
+async def test_parallel_reservations_respect_the_limit():
+    quota = QuotaLedger(limit=2)
+
+    reservations = await asyncio.gather(*(quota.reserve(USER_ID) for _ in range(5)))
+
+    assert sum(r is not None for r in reservations) == 2
+
+
+async def test_flush_works_on_legacy_users_table(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    legacy = sqlite3.connect(path, check_same_thread=False)
+    legacy.execute("CREATE TABLE users (telegram_id INTEGER PRIMARY KEY, message_count INTEGER)")
+    legacy.commit()
+    monkeypatch.setattr(database, "_conn", legacy)
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(database, "_initialized", False)
+    database.init_db()
+
+    quota = QuotaLedger(limit=10)
+    for _ in range(2):
+        (await quota.reserve(5)).commit()
+        await quota.flush()
+    legacy.close()
+
+    assert not quota._dirty
+    assert await database.get_used_messages(5) == 2
+
+
+async def test_eviction_drops_the_least_recently_used_idle_user(monkeypatch):
+    monkeypatch.setattr(quota_module, "CACHE_SIZE", 2)
+    quota = QuotaLedger(limit=10)
+    pinned = await quota.reserve(1)
+    for user_id in (2, 3):
+        (await quota.reserve(user_id)).release()
+    assert list(quota._used) == [1, 3]
+
+    pinned.release()
+    (await quota.reserve(1)).release()
+    (await quota.reserve(4)).release()
+
+    assert list(quota._used) == [1, 4]
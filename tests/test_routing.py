@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+
+import database
+import routing
+from bot import build_dispatcher
+from conftest import TOKEN
+from fakes import Reply
+from lifecycle import Lifecycle
+from quota import QuotaLedger
+from routing import FAST_MODEL, STRONG_MODEL, complete
+
+pytestmark = pytest.mark.asyncio
+
+SIMPLE = "hello there"
+REASONING = "Explain step by step why the sky is blue"
+
+
+def _messages(prompt: str):
+    return [{"role": "user", "content": prompt}]
+
+
+async def test_simple_prompt_uses_fast_model(openai_server):
+    assert await complete(_messages(SIMPLE), "en", premium=True) == "ok"
+    assert openai_server.models() == [FAST_MODEL]
+
+
+async def test_reasoning_prompt_of_premium_user_uses_strong_model(openai_server):
+    await complete(_messages(REASONING), "en", premium=True)
+    await complete(_messages(REASONING), "en", premium=False)
+
+    assert openai_server.models() == [STRONG_MODEL, FAST_MODEL]
+
+
+async def test_truncated_fast_answer_is_escalated(openai_server):
+    openai_server.script[FAST_MODEL] = [Reply("partial", finish_reason="length")]
+    openai_server.script[STRONG_MODEL] = [Reply("full answer")]
+
+    assert await complete(_messages(SIMPLE), "en") == "full answer"
+    assert openai_server.models() == [FAST_MODEL, STRONG_MODEL]
+    assert routing.route_stats()["cascade"]["requests"] >= 1
+
+
+async def test_cascade_past_deadline_keeps_first_answer(openai_server):
+    openai_server.script[FAST_MODEL] = [Reply("partial", finish_reason="length")]
+    openai_server.script[STRONG_MODEL] = [Reply("late", delay=5)]
+    deadline = asyncio.get_running_loop().time() + 0.5
+
+    assert await complete(_messages(SIMPLE), "en", deadline=deadline) == "partial"
+
+
+async def test_translations_are_not_escalated(openai_server):
+    openai_server.script[FAST_MODEL] = [Reply("", finish_reason="length")]
+
+    assert await complete(_messages(REASONING), "tr", task="translate", premium=True) == ""
+    assert openai_server.models() == [FAST_MODEL]
+
+
+async def test_bot_routes_premium_users_with_cached_flag(telegram, openai_server, monkeypatch):
+    user_id = 3003
+    database.get_conn().execute("INSERT INTO users (user_id, is_premium) VALUES (?, 0)", (user_id,))
+    database.get_conn().commit()
+    assert not await database.is_premium_user(user_id)
+    await database.mark_user_premium(user_id)
+
+    def no_connect(*args, **kwargs):
+        raise AssertionError("premium flag must come from the cache")
+
+    bot = Bot(TOKEN, session=telegram.session())
+    quota = QuotaLedger(limit=10)
+    quota._used[user_id] = 0
+    monkeypatch.setattr(database.aiosqlite, "connect", no_connect)
+    lifecycle = Lifecycle()
+    polling = asyncio.create_task(lifecycle.run_polling(build_dispatcher(bot, "en", quota), bot))
+    telegram.push_message(REASONING, user_id=user_id)
+    await telegram.wait_for("sendMessage")
+    await lifecycle.shutdown()
+    await polling
+
+    assert openai_server.models() == [STRONG_MODEL]
@@ -0,0 +1,144 @@
+import pytest
+from aiogram import Bot
+
+import database
+from conftest import OWNER_ID, TOKEN, run_support_bot
+from fakes import Reply
+from fsm_storage import SQLiteStorage
+from i18n import text
+from tickets import TicketDigest
+
+pytestmark = pytest.mark.asyncio
+
+CUSTOMER = 3003
+
+
+async def test_failed_digest_is_sent_on_next_flush(telegram):
+    bot = Bot(TOKEN, session=telegram.session())
+    digest = TicketDigest(bot, OWNER_ID, interval=60, max_tickets=100)
+    digest.add(1, 11, "pay", "ru", "не прошла оплата")
+    digest.add(2, 12, "support", "ru", "бот не отвечает")
+    telegram.fail["sendMessage"] = 1
+
+    await digest.flush()
+    digest.add(3, 13, "support", "ru", "новый вопрос")
+    await digest.flush()
+    await bot.session.close()
+
+    assert len(telegram.sent()) == 2
+    text = telegram.sent()[1]["text"]
+    assert text.index("#1 ") < text.index("#2 ") < text.index("#3 ")
+
+
+async def test_only_unsent_chunks_are_kept(telegram):
+    bot = Bot(TOKEN, session=telegram.session())
+    digest = TicketDigest(bot, OWNER_ID, interval=60, max_tickets=100)
+    # Each ticket fills most of a message, so every one is a separate chunk
+    for ticket_id in (1, 2, 3):
+        digest.add(ticket_id, ticket_id, "support", "ru", "x" * 3000)
+    telegram.fail_after["sendMessage"] = 1
+    telegram.fail["sendMessage"] = 1
+
+    await digest.flush()
+    await bot.session.close()
+
+    assert len(telegram.sent()) == 2
+    assert telegram.sent()[0]["text"].startswith("#1 ")
+    assert [line.split()[0] for line in digest._unsent] == ["#2", "#3"]
+
+
+async def test_retried_lines_are_not_translated_again(telegram, openai_server):
+    openai_server.default = Reply('["не работает"]')
+    bot = Bot(TOKEN, session=telegram.session())
+    digest = TicketDigest(bot, OWNER_ID, interval=60, max_tickets=100)
+    digest.add(1, 11, "support", "en", "it does not work")
+    telegram.fail["sendMessage"] = 1
+
+    await digest.flush()
+    await digest.flush()
+    await bot.session.close()
+
+    assert len(openai_server.requests) == 1
+    assert telegram.sent()[1]["text"] == "#1 support from 11 [en]: не работает"
+
+
+@pytest.mark.parametrize("code", [400, 403])
+async def test_rejected_chat_drops_the_digest(telegram, code):
+    bot = Bot(TOKEN, session=telegram.session())
+    digest = TicketDigest(bot, OWNER_ID, interval=60, max_tickets=100)
+    digest.add(1, 11, "pay", "ru", "не прошла оплата")
+    telegram.fail["sendMessage"] = 1
+    telegram.fail_code["sendMessage"] = code
+
+    await digest.flush()
+    await digest.flush()
+    await bot.session.close()
+
+    assert len(telegram.sent()) == 1
+    assert not digest._unsent
+
+
+async def test_unsent_lines_are_capped(telegram):
+    bot = Bot(TOKEN, session=telegram.session())
+    digest = TicketDigest(bot, OWNER_ID, interval=60, max_tickets=100, max_unsent=2)
+    for ticket_id in (1, 2, 3):
+        digest.add(ticket_id, ticket_id, "support", "ru", "вопрос")
+    telegram.fail["sendMessage"] = 1
+
+    await digest.flush()
+    await bot.session.close()
+
+    assert [line.split()[0] for line in digest._unsent] == ["#2", "#3"]
+
+
+async def test_open_ticket_reuses_the_open_ticket_of_the_same_kind():
+    first = database.open_ticket(CUSTOMER, "customer", "en", "support", "hello")
+    again = database.open_ticket(CUSTOMER, "customer", "tr", "support", "still there?")
+    payment = database.open_ticket(CUSTOMER, "customer", "tr", "pay", "no stars")
+
+    assert again == first
+    assert payment != first
+    assert database.get_ticket(first)["language_code"] == "tr"
+    assert database.get_open_ticket_id(CUSTOMER) == payment
+
+
+async def test_status_changes():
+    ticket_id = database.open_ticket(CUSTOMER, "customer", "en", "support", "hello")
+
+    database.set_ticket_status(ticket_id, "answered")
+    reopened = database.open_ticket(CUSTOMER, "customer", "en", "support", "one more")
+    database.set_ticket_status(ticket_id, "closed")
+
+    assert reopened != ticket_id
+    assert [t["id"] for t in database.list_tickets("open")] == [reopened]
+    assert [t["id"] for t in database.list_tickets("closed")] == [ticket_id]
+    with pytest.raises(ValueError):
+        database.set_ticket_status(ticket_id, "lost")
+
+
+async def test_owner_reply_reaches_the_user_and_answers_the_ticket(
+    telegram, openai_server, support_owner, tmp_path
+):
+    openai_server.default = Reply("Merhaba")
+    bot = Bot(TOKEN, session=telegram.session())
+    digest = TicketDigest(bot, OWNER_ID, interval=60, max_tickets=100)
+    storage = SQLiteStorage(str(tmp_path / "fsm.db"))
+
+    await run_support_bot(telegram, digest, storage, [
+        (CUSTOMER, "/support", 1),
+        (CUSTOMER, "kod çalışmıyor", 1),
+    ])
+    ticket_id = database.get_open_ticket_id(CUSTOMER)
+    await run_support_bot(telegram, digest, storage, [
+        (OWNER_ID, f"reply:#{ticket_id} Привет", 1),
+        (OWNER_ID, "reply:#999999 Привет", 1),
+    ])
+    await storage.close()
+    await bot.session.close()
+
+    sent = telegram.sent()
+    assert [m["text"] for m in sent[:2]] == [text("en", "ask_support"), "✅"]
+    assert (sent[2]["chat_id"], sent[2]["text"]) == (str(CUSTOMER), "Merhaba")
+    assert (sent[3]["chat_id"], sent[3]["text"]) == (str(OWNER_ID), "Тикет не найден")
+    assert database.get_ticket(ticket_id)["status"] == "answered"
+    assert digest._pending[0][:3] == (ticket_id, CUSTOMER, "support")
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from utils import translate_batch
+
+DIGEST_INTERVAL = float(os.getenv("SUPPORT_DIGEST_INTERVAL", "30"))
+DIGEST_MAX_TICKETS = int(os.getenv("SUPPORT_DIGEST_MAX_TICKETS", "20"))
+# Unsent digest lines kept for the next try, the oldest are dropped first
+DIGEST_MAX_UNSENT = int(os.getenv("SUPPORT_DIGEST_MAX_UNSENT", "200"))
+OWNER_LANG = "ru"
+# Telegram rejects messages longer than 4096 characters
+MAX_MESSAGE_LENGTH = 4096
+
+logger = logging.getLogger(__name__)
+
+
+class TicketDigest:
+    """Collect new tickets and send them to the owner in batches.
+
+    A digest goes out every ``interval`` seconds or as soon as ``max_tickets``
+    are pending. All texts of one digest are translated with one request.
+    Lines that could not be sent are kept already translated and go out
+    with the next digest. Tickets stay in the database either way.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        interval: float = DIGEST_INTERVAL,
+        max_tickets: int = DIGEST_MAX_TICKETS,
+        max_unsent: int = DIGEST_MAX_UNSENT,
+    ) -> None:
+        self.bot = bot
+        self.chat_id = chat_id
+        self.interval = interval
+        self.max_tickets = max_tickets
+        self.max_unsent = max_unsent
+        self._pending: List[Tuple[int, int, str, str, str]] = []
+        self._unsent: List[str] = []
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, ticket_id: int, user_id: int, kind: str, lang: str, text: str) -> None:
+        self._pending.append((ticket_id, user_id, kind, lang, text))
+        if len(self._pending) >= self.max_tickets:
+            self._full.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the timer and send whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to send support digest")
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        lines, self._unsent = self._unsent, []
+        if batch:
+            lines += await self._format(batch)
+        if not lines:
+            return
+        sent = 0
+        try:
+            for chunk, count in _chunks(lines):
+                await self.bot.send_message(self.chat_id, chunk)
+                sent += count
+        except (TelegramBadRequest, TelegramForbiddenError) as e:
+            # Wrong chat id or the owner blocked the bot, a retry will not help
+            logger.error("Dropped %d digest tickets, see /tickets: %s", len(lines) - sent, e)
+        except Exception:
+            logger.exception("Failed to send %d digest tickets, will retry", len(lines) - sent)
+            # Put unsent lines back in front of the ones queued meanwhile
+            self._unsent[:0] = lines[sent:]
+            dropped = len(self._unsent) - self.max_unsent
+            if dropped > 0:
+                del self._unsent[:dropped]
+                logger.warning("Dropped %d oldest digest tickets, see /tickets", dropped)
+
+    async def _format(self, batch: List[Tuple[int, int, str, str, str]]) -> List[str]:
+        foreign = [i for i, item in enumerate(batch) if item[3] != OWNER_LANG]
+        texts = [item[4] for item in batch]
+        if foreign:
+            try:
+                translated = await translate_batch([texts[i] for i in foreign], OWNER_LANG)
+            except Exception:
+                logger.exception("Digest translation failed, sending originals")
+                translated = [texts[i] for i in foreign]
+            for i, text in zip(foreign, translated):
+                texts[i] = text
+        return [
+            f"#{ticket_id} {kind} from {user_id} [{lang}]: {text}"
+            for (ticket_id, user_id, kind, lang, _), text in zip(batch, texts)
+        ]
+
+
+def _chunks(lines: List[str]) -> List[Tuple[str, int]]:
+    """Join lines into messages under the length limit, with their line counts."""
+    chunks: List[Tuple[str, int]] = []
+    current = ""
+    count = 0
+    for line in lines:
+        line = line[:MAX_MESSAGE_LENGTH]
+        if current and len(current) + len(line) + 2 > MAX_MESSAGE_LENGTH:
+            chunks.append((current, count))
+            current = ""
+            count = 0
+        current = f"{current}\n\n{line}" if current else line
+        count += 1
+    if current:
+        chunks.append((current, count))
+    return chunks
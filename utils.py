@@ -1,7 +1,9 @@
 from typing import Dict, List, Dict as DictType
+import json
 import logging
 import aiosqlite
 from database import DB_PATH
+from i18n import language_name, strings as locale_strings
 
 
 def log_info(message: str) -> None:
@@ -11,19 +13,7 @@ def log_info(message: str) -> None:
 
 def get_locale_strings(lang_code: str) -> Dict[str, str]:
     """Return localized strings for supported languages."""
-    data = {
-        "en": {
-            "greeting": "Hello! I'm your AI assistant.",
-            "limit_exceeded": "Free message limit exceeded.",
-            "buy_button": "Buy access",
-        },
-        "ru": {
-            "greeting": "Привет! Я твой ИИ помощник.",
-            "limit_exceeded": "Лимит бесплатных сообщений исчерпан.",
-            "buy_button": "Купить доступ",
-        },
-    }
-    return data.get(lang_code, data["en"])
+    return locale_strings(lang_code)
 
 
 async def get_localized_strings(lang_code: str):
@@ -42,25 +32,44 @@ async def get_user_payments(user_id: int) -> List[DictType]:
     return [dict(row) for row in rows]
 
 
-from openai_client import chat
-
-LANG_NAMES = {
-    "tr": "Turkish",
-    "id": "Indonesian",
-    "ar": "Arabic",
-    "vi": "Vietnamese",
-    "pt": "Portuguese",
-    "ru": "Russian",
-    "en": "English",
-}
+from routing import complete
 
 
 async def translate_text(text: str, target_lang: str) -> str:
     """Translate text to the target language using OpenAI."""
-    lang = LANG_NAMES.get(target_lang, "English")
+    lang = language_name(target_lang)
     messages = [
         {"role": "system", "content": f"Translate the following text to {lang}. Only the translated text."},
         {"role": "user", "content": text},
     ]
-    return await chat(messages)
+    return await complete(messages, target_lang, task="translate")
+
 
+async def translate_batch(texts: List[str], target_lang: str) -> List[str]:
+    """Translate several texts with a single OpenAI request.
+
+    Falls back to the original texts when the reply is not a JSON array of
+    the expected length.
+    """
+    if not texts:
+        return []
+    lang = language_name(target_lang)
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                f"Translate every string of the JSON array to {lang}. "
+                "Reply only with a JSON array of the translations in the same order."
+            ),
+        },
+        {"role": "user", "content": json.dumps(texts, ensure_ascii=False)},
+    ]
+    reply = await complete(messages, target_lang, task="translate")
+    try:
+        result = json.loads(reply)
+    except ValueError:
+        result = None
+    if not isinstance(result, list) or len(result) != len(texts):
+        logging.getLogger(__name__).warning("Batch translation returned unexpected reply")
+        return list(texts)
+    return [str(item) for item in result]